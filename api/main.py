@@ -1,3 +1,5 @@
+import time
+_t0 = time.time()
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -25,4 +27,13 @@ app.include_router(alerts.router, prefix="/alerts", tags=["alerts"])
 app.include_router(approvals.router, prefix="/approvals", tags=["approvals"])
 app.include_router(auth.router, tags=["auth"])
 
+@app.on_event("startup")
+def startup_report():
+    # Models load lazily (worker/model_registry.py); SEMANTIC_PRELOAD=1 opts in to loading the query embedder here.
+    from worker.model_registry import report
+    from . import semantic
+    if semantic.SEMANTIC_PRELOAD:
+        semantic.preload()
+    print(f"API startup {time.time() - _t0:.2f}s", report())
+
 app.mount("/static", StaticFiles(directory="/data"), name="static")
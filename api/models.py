@@ -1,9 +1,10 @@
 import uuid, enum
 from datetime import datetime
-from sqlalchemy import Column, Text, Integer, Float, JSON, Enum, ForeignKey, DateTime
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Text, Integer, Float, JSON, Enum, ForeignKey, DateTime, Computed, Index
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.orm import relationship
 from shared.db import Base
+from shared.vectors import Int8Vector
 
 class JobType(str, enum.Enum):
     INGEST = "INGEST"
@@ -34,12 +35,22 @@ class Video(Base):
     id = Column(UUID(as_uuid=False), primary_key=True, default=uuid4)
     youtube_url = Column(Text, nullable=False)
     yt_video_id = Column(Text, nullable=True)
+    channel_id = Column(Text, nullable=True)  # set when ingested from a ChannelSub
     title = Column(Text, nullable=True)
     duration_sec = Column(Integer, nullable=True)
     language = Column(Text, nullable=True)
     status = Column(Text, default="new")
     source_path = Column(Text, nullable=True)
+    audio_path = Column(Text, nullable=True)
+    proxy_path = Column(Text, nullable=True)  # low-res analysis proxy (worker/proxy.py)
+    wav_path = Column(Text, nullable=True)  # 16 kHz mono WAV for audio features
+    keyframes_path = Column(Text, nullable=True)  # keyframes-<source>.npz: keyframe times + source fingerprint (worker/keyframes.py)
+    audio_signals_path = Column(Text, nullable=True)  # audio.npz from ANALYZE_AUDIO (energy, pitch, bursts)
+    visual_path = Column(Text, nullable=True)  # visual.npz from ANALYZE_VISUAL (cuts, motion, faces)
+    windows_path = Column(Text, nullable=True)  # windows.npz from ANALYZE (scored windows + embeddings, for RERANK)
+    title_suggestions = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # last status/path change; media_cache pins expire from it
     transcripts = relationship("Transcript", back_populates="video", cascade="all, delete-orphan")
     segments = relationship("Segment", back_populates="video", cascade="all, delete-orphan")
     clips = relationship("Clip", back_populates="video", cascade="all, delete-orphan")
@@ -54,6 +65,19 @@ class Transcript(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     video = relationship("Video", back_populates="transcripts")
 
+class TranscriptChunk(Base):
+    """~20 s of a transcript for full-text search (worker/text_index.py)."""
+    __tablename__ = "transcript_chunk"
+    id = Column(UUID(as_uuid=False), primary_key=True, default=uuid4)
+    video_id = Column(UUID(as_uuid=False), ForeignKey("video.id", ondelete="CASCADE"), index=True)
+    transcript_id = Column(UUID(as_uuid=False), ForeignKey("transcript.id", ondelete="CASCADE"))
+    t_start = Column(Float, nullable=False)
+    t_end = Column(Float, nullable=False)
+    text = Column(Text, nullable=False)
+    words = Column(JSON, nullable=True)  # [[word, start, end]] to map hits back to timestamps
+    tsv = Column(TSVECTOR, Computed("to_tsvector('simple', text)", persisted=True))
+    __table_args__ = (Index("ix_transcript_chunk_tsv", "tsv", postgresql_using="gin"),)
+
 class Segment(Base):
     __tablename__ = "segment"
     id = Column(UUID(as_uuid=False), primary_key=True, default=uuid4)
@@ -61,7 +85,7 @@ class Segment(Base):
     t_start = Column(Float, nullable=False)
     t_end = Column(Float, nullable=False)
     features = Column(JSON, nullable=True)
-    embedding = Column(JSON, nullable=True)
+    embedding = Column(Int8Vector, nullable=True)  # int8-quantized unit vector (shared/vectors.py)
     score = Column(Float, nullable=True)
     reason = Column(JSON, nullable=True)
     status = Column(Text, default="candidate")
@@ -76,9 +100,25 @@ class Clip(Base):
     caption_style = Column(JSON, nullable=True)
     output_path = Column(Text, nullable=True)
     storage_url = Column(Text, nullable=True)
-    status = Column(Text, default="queued")
+    render_sec = Column(Float, nullable=True)  # wall-clock of the full-quality render
+    preview_path = Column(Text, nullable=True)  # low-res approval preview (worker tier "preview")
+    preview_url = Column(Text, nullable=True)
+    preview_render_sec = Column(Float, nullable=True)
+    status = Column(Text, default="queued")  # queued|previewing|preview_ready|rendering|rendered|failed
     metrics = Column(JSON, nullable=True)
+    title = Column(Text, nullable=True)
+    thumbnail_path = Column(Text, nullable=True)
+    thumbnail_url = Column(Text, nullable=True)
+    thumbnail_a_path = Column(Text, nullable=True)
+    thumbnail_a_url = Column(Text, nullable=True)
+    thumbnail_b_path = Column(Text, nullable=True)
+    thumbnail_b_url = Column(Text, nullable=True)
+    ab_status = Column(Text, nullable=True)  # running|stopped
+    ab_active = Column(Text, nullable=True)  # A|B
+    ab_history = Column(JSON, nullable=True)
+    style_variants = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # last status/path change; media_cache pins expire from it
     video = relationship("Video", back_populates="clips")
 
 class Job(Base):
@@ -112,6 +152,9 @@ class ChannelSub(Base):
     auto_render_top_k = Column(Integer, default=3)
     daily_post_time = Column(Text, nullable=True)  # "HH:MM" in UTC
     keywords = Column(JSON, nullable=True)  # default caption keywords
+    nms_top_k = Column(Integer, default=12)  # moments kept per video by ANALYZE
+    nms_iou = Column(Float, default=0.3)     # IoU above which overlapping windows are suppressed
+    score_weights = Column(JSON, nullable=True)  # ranker weight overrides: quoteability/exclam/visual/audio
 
 
 class AutoPost(Base):
@@ -129,7 +172,7 @@ class JobLog(Base):
     id = Column(UUID(as_uuid=False), primary_key=True, default=uuid4)
     type = Column(Text, nullable=False)
     payload = Column(JSON, nullable=True)
-    status = Column(Text, nullable=False, default="queued")  # queued|started|success|error
+    status = Column(Text, nullable=False, default="queued")  # queued|started|success|error|deferred
     error = Column(Text, nullable=True)
     attempts = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
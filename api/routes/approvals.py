@@ -5,7 +5,7 @@ from ..deps import api_key_guard, get_db
 from ..models import Clip, Video, Transcript, Segment
 from ..settings import settings
 from datetime import datetime, timedelta
-from ...nlp.titles import suggest_titles
+from nlp.titles import suggest_titles
 
 router = APIRouter()
 
@@ -50,6 +50,7 @@ def pending(request: Request, db: Session = Depends(get_db), limit: int = 12):
             "status": c.status,
             "views_24h": _views_24h(c.metrics or {}),
             "storage_url": c.storage_url,
+            "preview_url": c.preview_url,
             "current_title": c.title or v.title or ""
         })
         if len(items) >= limit:
@@ -75,6 +76,14 @@ def approve(clip_id: str, body: ApproveBody, db: Session = Depends(get_db)):
         found = next((it for it in variants if it.get("key")==body.style_key), None)
         if found:
             c.thumbnail_path = found.get("path"); c.thumbnail_url = found.get("url"); db.commit()
+    # approved clips get their full-quality render now (previews are low-res); publishing waits for it
+    if not c.output_path and c.status not in ("queued", "rendering"):
+        from redis import Redis
+        from worker.jobs import full_render_job
+        s = db.query(Segment).filter_by(id=c.segment_id).first() if c.segment_id else None
+        Redis.from_url(settings.REDIS_URL).lpush("jobs", __import__("json").dumps(full_render_job(c, s)))
+        c.status = "queued"
+        db.commit()
     # optionally publish
     if body.publish_youtube:
         from redis import Redis
@@ -5,6 +5,8 @@ from redis import Redis
 from ..deps import api_key_guard, get_db
 from ..settings import settings
 from ..models import ChannelSub, Video
+from .videos import ScoreWeights, RerankBody, rerank_job
+import json
 from datetime import datetime
 
 router = APIRouter()
@@ -14,6 +16,12 @@ class SubscribeBody(BaseModel):
     auto_render_top_k: int = 3
     daily_post_time: str | None = "08:00"  # UTC HH:MM
     keywords: list[str] | None = []
+    nms_top_k: int = 12
+    nms_iou: float = 0.3
+    score_weights: ScoreWeights | None = None
+
+class ChannelRerankBody(RerankBody):
+    save: bool = False  # also store the weights / NMS settings on the channel for future ANALYZE runs
 
 @router.post("/subscribe", dependencies=[Depends(api_key_guard)])
 def subscribe(body: SubscribeBody, db: Session = Depends(get_db)):
@@ -22,8 +30,12 @@ def subscribe(body: SubscribeBody, db: Session = Depends(get_db)):
         sub.auto_render_top_k = body.auto_render_top_k
         sub.daily_post_time = body.daily_post_time
         sub.keywords = body.keywords
+        sub.nms_top_k = body.nms_top_k
+        sub.nms_iou = body.nms_iou
+        sub.score_weights = body.score_weights.model_dump(exclude_none=True) if body.score_weights else None
     else:
-        sub = ChannelSub(channel_id=body.channel_id, auto_render_top_k=body.auto_render_top_k, daily_post_time=body.daily_post_time, keywords=body.keywords or [])
+        sub = ChannelSub(channel_id=body.channel_id, auto_render_top_k=body.auto_render_top_k, daily_post_time=body.daily_post_time, keywords=body.keywords or [], nms_top_k=body.nms_top_k, nms_iou=body.nms_iou,
+                         score_weights=body.score_weights.model_dump(exclude_none=True) if body.score_weights else None)
         db.add(sub)
     db.commit()
     return {"ok": True, "id": sub.id}
@@ -36,10 +48,29 @@ def list_channels(db: Session = Depends(get_db)):
             "id": s.id, "channel_id": s.channel_id, "title": s.title,
             "last_published_at": s.last_published_at.isoformat() if s.last_published_at else None,
             "enabled": bool(s.enabled), "auto_render_top_k": s.auto_render_top_k,
-            "daily_post_time": s.daily_post_time, "keywords": s.keywords or []
+            "daily_post_time": s.daily_post_time, "keywords": s.keywords or [],
+            "nms_top_k": s.nms_top_k, "nms_iou": s.nms_iou, "score_weights": s.score_weights
         }
     return {"channels": [row(s) for s in rows]}
 
+@router.post("/{channel_id}/rerank", dependencies=[Depends(api_key_guard)], status_code=202)
+def rerank_channel(channel_id: str, body: ChannelRerankBody = ChannelRerankBody(), db: Session = Depends(get_db)):
+    """Re-rank the channel's whole back catalog from stored windows in one RERANK job."""
+    sub = db.query(ChannelSub).filter_by(channel_id=channel_id).first()
+    if body.save:
+        if not sub:
+            raise HTTPException(404, "channel not subscribed")
+        if body.weights:
+            sub.score_weights = body.weights.model_dump(exclude_none=True)
+        if body.top_k is not None:
+            sub.nms_top_k = body.top_k
+        if body.iou_thr is not None:
+            sub.nms_iou = body.iou_thr
+        db.commit()
+    n = db.query(Video).filter(Video.channel_id == channel_id, Video.status == "analyze_done").count()
+    Redis.from_url(settings.REDIS_URL).lpush("jobs", json.dumps(rerank_job(body, channel_id=channel_id)))
+    return {"channel_id": channel_id, "videos": n, "jobs": ["RERANK"]}
+
 @router.post("/sync_all", dependencies=[Depends(api_key_guard)])
 def sync_all(db: Session = Depends(get_db)):
     r = Redis.from_url(settings.REDIS_URL)
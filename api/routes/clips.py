@@ -5,7 +5,7 @@ from redis import Redis
 from ..deps import api_key_guard, get_db
 from ..settings import settings
 from ..models import Clip, Segment, Video
-import json
+import os, json
 
 router = APIRouter()
 
@@ -23,16 +23,19 @@ def render(video_id: str, payload: RenderRequest, db: Session = Depends(get_db))
     if not segs:
         raise HTTPException(400, "no valid segments provided")
 
+    from worker.jobs import render_jobs
     r = Redis.from_url(settings.REDIS_URL)
-    clip_ids = []
+    clip_ids, items = [], []
     for s in segs:
         clip = Clip(video_id=video_id, segment_id=s.id, aspect_ratio=payload.aspect_ratio, caption_style=payload.caption_style or {})
         db.add(clip)
         db.commit()
         db.refresh(clip)
-        job = {"type":"RENDER","video_id": video_id,"clip_id": clip.id,"segment_id": s.id,"start": s.t_start,"end": s.t_end,"aspect_ratio": payload.aspect_ratio}
-        r.lpush("jobs", json.dumps(job, separators=(',',':')))
+        items.append({"clip_id": clip.id,"segment_id": s.id,"start": s.t_start,"end": s.t_end,"aspect_ratio": payload.aspect_ratio})
         clip_ids.append(clip.id)
+    # several clips of one video go out as a single RENDER_BATCH (one shared decode) in batch mode
+    for job in render_jobs(video_id, items):
+        r.lpush("jobs", json.dumps(job, separators=(',',':')))
     return {"clip_ids": clip_ids}
 
 @router.get("/{clip_id}", dependencies=[Depends(api_key_guard)])
@@ -40,12 +43,14 @@ def get_clip(clip_id: str, db: Session = Depends(get_db)):
     c = db.query(Clip).filter_by(id=clip_id).first()
     if not c:
         raise HTTPException(404, "clip not found")
-    return {"clip_id": c.id, "status": c.status, "storage_url": c.storage_url, "output_path": c.output_path}
+    return {"clip_id": c.id, "status": c.status, "storage_url": c.storage_url, "output_path": c.output_path,
+            "preview_url": c.preview_url, "render_sec": c.render_sec, "preview_render_sec": c.preview_render_sec}
 
 @router.get("/video/{video_id}", dependencies=[Depends(api_key_guard)])
 def list_clips_for_video(video_id: str, db: Session = Depends(get_db)):
     rows = db.query(Clip).filter_by(video_id=video_id).all()
-    return {"clips": [{"clip_id": c.id, "status": c.status, "storage_url": c.storage_url, "output_path": c.output_path} for c in rows]}
+    return {"clips": [{"clip_id": c.id, "status": c.status, "storage_url": c.storage_url, "output_path": c.output_path,
+                       "preview_url": c.preview_url} for c in rows]}
 
 @router.get("/{clip_id}/signed_url", dependencies=[Depends(api_key_guard)])
 def get_signed_url(clip_id: str, db: Session = Depends(get_db)):
@@ -80,6 +85,30 @@ def publish_youtube(clip_id: str, body: PublishBody, db: Session = Depends(get_d
     return {"ok": True, "job": "UPLOAD_YT"}
 
 
+THUMB_TIMEOUT = float(os.getenv("THUMB_TIMEOUT", "60"))
+PRIORITY_QUEUE = os.getenv("JOBS_PRIORITY_QUEUE", "jobs:priority")  # popped before "jobs" by the worker
+
+def _render_thumbnails(c, aspect_ratio, variants):
+    """Queue a THUMBNAILS job on the priority lane and wait for the worker's reply.
+    variants: [{"title", "path"}]; the frame is extracted once and all variants share it.
+    Blocking: callers are plain `def` endpoints, which FastAPI runs in its threadpool."""
+    import uuid
+    reply = f"reply:thumbnails:{uuid.uuid4().hex}"
+    r = Redis.from_url(settings.REDIS_URL)
+    job = {"type": "THUMBNAILS", "clip_id": c.id, "aspect_ratio": aspect_ratio, "variants": variants, "reply": reply}
+    r.lpush(PRIORITY_QUEUE, json.dumps(job, separators=(',',':')))
+    got = r.blpop(reply, timeout=THUMB_TIMEOUT)
+    if got is None:
+        raise HTTPException(504, "thumbnail rendering timed out")
+    res = json.loads(got[1])
+    if not res.get("ok"):
+        raise HTTPException(500, res.get("error") or "thumbnail rendering failed")
+
+def _thumb_dir():
+    base_dir = os.getenv("MEDIA_ROOT", "/data")
+    os.makedirs(os.path.join(base_dir, "thumbnails"), exist_ok=True)
+    return os.path.join(base_dir, "thumbnails")
+
 class ThumbBody(BaseModel):
     title: str | None = None
     aspect_ratio: str = "9:16"
@@ -88,23 +117,9 @@ class ThumbBody(BaseModel):
 def make_thumbnail(clip_id: str, body: ThumbBody, db: Session = Depends(get_db)):
     c = db.query(Clip).filter_by(id=clip_id).first()
     if not c: raise HTTPException(404, "clip not found")
-    from ..models import Video, Segment
-    v = db.query(Video).filter_by(id=c.video_id).first()
-    s = db.query(Segment).filter_by(id=c.segment_id).first()
-    if not (v and s): raise HTTPException(400, "clip missing video/segment")
-    # generate now (sync) for simplicity
-    base_dir = os.getenv("MEDIA_ROOT", "/data")
-    os.makedirs(os.path.join(base_dir, "thumbnails"), exist_ok=True)
-    out = os.path.join(base_dir, "thumbnails", f"{clip_id}.jpg")
-    from ..settings import settings
-    from ..deps import get_db as _
-    from ...worker.pipeline import generate_thumbnail, compute_face_crop
-    crop_hint = None
-    try:
-        crop_hint = compute_face_crop(v.source_path, s.t_start, s.t_end, target_h=1920, crop_w=1080) if body.aspect_ratio == "9:16" else None
-    except Exception:
-        crop_hint = None
-    generate_thumbnail(v.source_path, s.t_start, s.t_end, out, body.aspect_ratio, crop_hint, body.title or "")
+    if not c.segment_id: raise HTTPException(400, "clip missing video/segment")
+    out = os.path.join(_thumb_dir(), f"{clip_id}.jpg")
+    _render_thumbnails(c, body.aspect_ratio, [{"title": body.title or "", "path": out}])
     c.thumbnail_path = out
     c.thumbnail_url = f"/static/thumbnails/{clip_id}.jpg"
     db.commit()
@@ -119,23 +134,11 @@ class ABThumbsBody(BaseModel):
 def ab_thumbs(clip_id: str, body: ABThumbsBody, db: Session = Depends(get_db)):
     c = db.query(Clip).filter_by(id=clip_id).first()
     if not c: raise HTTPException(404, "clip not found")
-    from ..models import Video, Segment
-    v = db.query(Video).filter_by(id=c.video_id).first()
-    s = db.query(Segment).filter_by(id=c.segment_id).first()
-    if not (v and s): raise HTTPException(400, "clip missing video/segment")
-    # generate A & B
-    base_dir = os.getenv("MEDIA_ROOT", "/data")
-    os.makedirs(os.path.join(base_dir, "thumbnails"), exist_ok=True)
-    a_path = os.path.join(base_dir, "thumbnails", f"{clip_id}_A.jpg")
-    b_path = os.path.join(base_dir, "thumbnails", f"{clip_id}_B.jpg")
-    from ...worker.pipeline import generate_thumbnail, compute_face_crop
-    crop_hint = None
-    try:
-        crop_hint = compute_face_crop(v.source_path, s.t_start, s.t_end, target_h=1920, crop_w=1080) if body.aspect_ratio == "9:16" else None
-    except Exception:
-        crop_hint = None
-    generate_thumbnail(v.source_path, s.t_start, s.t_end, a_path, body.aspect_ratio, crop_hint, body.title_a)
-    generate_thumbnail(v.source_path, s.t_start, s.t_end, b_path, body.aspect_ratio, crop_hint, body.title_b)
+    if not c.segment_id: raise HTTPException(400, "clip missing video/segment")
+    # generate A & B from one frame
+    a_path = os.path.join(_thumb_dir(), f"{clip_id}_A.jpg")
+    b_path = os.path.join(_thumb_dir(), f"{clip_id}_B.jpg")
+    _render_thumbnails(c, body.aspect_ratio, [{"title": body.title_a, "path": a_path}, {"title": body.title_b, "path": b_path}])
     c.thumbnail_a_path = a_path; c.thumbnail_a_url = f"/static/thumbnails/{clip_id}_A.jpg"
     c.thumbnail_b_path = b_path; c.thumbnail_b_url = f"/static/thumbnails/{clip_id}_B.jpg"
     db.commit()
@@ -168,31 +171,17 @@ class StylePackBody(BaseModel):
 def make_styles(clip_id: str, body: StylePackBody, db: Session = Depends(get_db)):
     c = db.query(Clip).filter_by(id=clip_id).first()
     if not c: raise HTTPException(404, "clip not found")
-    from ..models import Video, Segment
-    v = db.query(Video).filter_by(id=c.video_id).first()
-    s = db.query(Segment).filter_by(id=c.segment_id).first()
-    if not (v and s): raise HTTPException(400, "clip missing video/segment")
-    base_dir = os.getenv("MEDIA_ROOT", "/data")
-    os.makedirs(os.path.join(base_dir, "thumbnails"), exist_ok=True)
-    from ...worker.pipeline import generate_thumbnail, compute_face_crop
-    crop_hint = None
-    try:
-        crop_hint = compute_face_crop(v.source_path, s.t_start, s.t_end, target_h=1920, crop_w=1080) if body.aspect_ratio == "9:16" else None
-    except Exception:
-        crop_hint = None
-
+    if not c.segment_id: raise HTTPException(400, "clip missing video/segment")
     styles = [
         {"key":"S1","title": body.title, "uppercase": False, "emoji": ""},
         {"key":"S2","title": body.title.upper(), "uppercase": True, "emoji": "🔥"},
         {"key":"S3","title": "💡 " + body.title, "uppercase": False, "emoji": "💡"},
         {"key":"S4","title": body.title, "uppercase": False, "emoji": "🚀"},
     ]
-    out_items = []
-    for st in styles:
-        out = os.path.join(base_dir, "thumbnails", f"{clip_id}_{st['key']}.jpg")
-        # Reuse generate_thumbnail; store emoji in title if present
-        generate_thumbnail(v.source_path, s.t_start, s.t_end, out, body.aspect_ratio, crop_hint, st["title"])
-        out_items.append({"key": st["key"], "url": f"/static/thumbnails/{clip_id}_{st['key']}.jpg", "path": out, "style": st})
+    out_items = [{"key": st["key"], "url": f"/static/thumbnails/{clip_id}_{st['key']}.jpg",
+                  "path": os.path.join(_thumb_dir(), f"{clip_id}_{st['key']}.jpg"), "style": st} for st in styles]
+    # all four variants come from one frame extraction in the worker
+    _render_thumbnails(c, body.aspect_ratio, [{"title": it["style"]["title"], "path": it["path"]} for it in out_items])
     c.style_variants = out_items
     db.commit()
     return {"variants": [{"key":it["key"], "url": it["url"]} for it in out_items]}
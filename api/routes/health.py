@@ -32,6 +32,10 @@ def _check_storage() -> tuple[bool, dict]:
     ok = os.path.isdir(root) and os.access(root, os.W_OK)
     return ok, {"media_root": root}
 
+def _process_report() -> dict:
+    from worker.model_registry import report
+    return report()
+
 @router.get("/health")
 def health(db: Session = Depends(get_db)):
     db_ok, db_err = _check_db(db)
@@ -46,7 +50,8 @@ def health(db: Session = Depends(get_db)):
             "db": {"ok": db_ok, "error": db_err},
             "redis": {"ok": r_ok, "queue_len": qlen, "error": r_err},
             "storage": {"ok": s_ok, **s_info},
-        }
+        },
+        "process": _process_report(),
     }
 
 @router.get("/metrics")
@@ -58,6 +63,7 @@ def metrics(db: Session = Depends(get_db)):
     g_videos = Gauge("app_videos_total", "Total videos", registry=reg)
     g_clips = Gauge("app_clips_total", "Total clips", registry=reg)
     g_uptime = Gauge("app_uptime_seconds", "API process uptime (seconds)", registry=reg)
+    g_tc = Gauge("app_transcript_cache", "Transcript cache lookups by result", ["result"], registry=reg)
 
     db_ok, _ = _check_db(db)
     g_db.set(1 if db_ok else 0)
@@ -77,5 +83,12 @@ def metrics(db: Session = Depends(get_db)):
 
     g_uptime.set(time.time() - _start)
 
+    try:
+        from worker.transcript_cache import stats
+        for result, n in stats().items():
+            g_tc.labels(result=result).set(n)
+    except Exception:
+        pass
+
     output = generate_latest(reg)
     return Response(content=output, media_type=CONTENT_TYPE_LATEST)
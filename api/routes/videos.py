@@ -1,17 +1,35 @@
 import uuid
+import json
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, HttpUrl
 from redis import Redis
 from sqlalchemy.orm import Session
 from ..deps import api_key_guard, get_db
 from ..settings import settings
-from ..models import Video, Segment
+from ..models import Video, Segment, TranscriptChunk
 
 router = APIRouter()
 
 class CreateVideo(BaseModel):
     youtube_url: HttpUrl
 
+class ScoreWeights(BaseModel):
+    quoteability: float | None = None
+    exclam: float | None = None
+    visual: float | None = None
+    audio: float | None = None
+
+class RerankBody(BaseModel):
+    weights: ScoreWeights | None = None
+    top_k: int | None = None
+    iou_thr: float | None = None
+
+def rerank_job(body: RerankBody, **target):
+    job = {"type": "RERANK", **target, "top_k": body.top_k, "iou_thr": body.iou_thr}
+    if body.weights:
+        job["weights"] = body.weights.model_dump(exclude_none=True)
+    return job
+
 @router.get("", dependencies=[Depends(api_key_guard)])
 def list_videos(db: Session = Depends(get_db), limit: int = Query(20, ge=1, le=100)):
     rows = (db.query(Video).order_by(Video.created_at.desc()).limit(limit).all())
@@ -32,6 +50,66 @@ def create_video(payload: CreateVideo, db: Session = Depends(get_db)):
     r.lpush("jobs", f'{{"type":"INGEST","video_id":"{video.id}","youtube_url":"{video.youtube_url}"}}')
     return {"video_id": video.id, "jobs": ["INGEST"]}
 
+@router.get("/search/semantic", dependencies=[Depends(api_key_guard)])
+def semantic_search(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    """Moments across the library closest in meaning to q (ANN over Segment embeddings, api/semantic.py)."""
+    import time
+    from ..semantic import search, embed_query
+    t0 = time.perf_counter()
+    hits = search(db, embed_query(q), limit)
+    segs = {s.id: s for s in db.query(Segment).filter(Segment.id.in_([sid for sid, _ in hits]))} if hits else {}
+    vids = {v.id: v for v in db.query(Video).filter(Video.id.in_({s.video_id for s in segs.values()}))} if segs else {}
+    return {"query": q, "took_ms": round(1000 * (time.perf_counter() - t0), 1), "moments": [{
+        "segment_id": sid, "video_id": segs[sid].video_id, "youtube_url": vids[segs[sid].video_id].youtube_url,
+        "title": vids[segs[sid].video_id].title, "start": segs[sid].t_start, "end": segs[sid].t_end,
+        "score": segs[sid].score, "similarity": round(sim, 4)
+    } for sid, sim in hits if sid in segs]}
+
+@router.get("/search/text", dependencies=[Depends(api_key_guard)])
+def text_search(q: str = Query(..., min_length=1), video_id: str | None = None, channel_id: str | None = None,
+                limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0), db: Session = Depends(get_db)):
+    """Transcript passages matching q (websearch syntax: "quoted phrase", or, -word), best first.
+
+    Served from the transcript_chunk GIN index; each hit carries the matched words' timestamps and
+    the highest-scored Segment covering the first match, if any."""
+    from sqlalchemy import func
+    from worker.text_index import query_terms, match_words
+    tsq = func.websearch_to_tsquery("simple", q)
+    rank = func.ts_rank_cd(TranscriptChunk.tsv, tsq)
+    base = db.query(TranscriptChunk).filter(TranscriptChunk.tsv.op("@@")(tsq))
+    if video_id:
+        base = base.filter(TranscriptChunk.video_id == video_id)
+    if channel_id:
+        base = base.join(Video, Video.id == TranscriptChunk.video_id).filter(Video.channel_id == channel_id)
+    total = base.count()
+    page = (base.with_entities(TranscriptChunk, rank.label("rank"),
+                               func.ts_headline("simple", TranscriptChunk.text, tsq, "StartSel=[[,StopSel=]],MaxWords=40,MinWords=15"))
+            .order_by(rank.desc(), TranscriptChunk.video_id, TranscriptChunk.t_start).offset(offset).limit(limit).all())
+    vids = {c.video_id for c, _, _ in page}
+    videos = {v.id: v for v in db.query(Video).filter(Video.id.in_(vids))} if vids else {}
+    segs = {}
+    for s in (db.query(Segment).filter(Segment.video_id.in_(vids)).all() if vids else []):
+        segs.setdefault(s.video_id, []).append(s)
+    terms, hits = query_terms(q), []
+    for c, r, snippet in page:
+        matches = match_words(c.words, terms)
+        t = matches[0]["start"] if matches else c.t_start
+        cover = [s for s in segs.get(c.video_id, []) if s.t_start <= t <= s.t_end]
+        best = max(cover, key=lambda s: s.score or 0.0) if cover else None
+        v = videos.get(c.video_id)
+        hits.append({"video_id": c.video_id, "youtube_url": v and v.youtube_url, "title": v and v.title,
+                     "start": c.t_start, "end": c.t_end, "t": t, "rank": round(float(r), 4), "snippet": snippet,
+                     "matches": matches,
+                     "segment": {"segment_id": best.id, "start": best.t_start, "end": best.t_end, "score": best.score} if best else None})
+    return {"query": q, "total": total, "offset": offset, "limit": limit, "hits": hits}
+
+@router.post("/search/text/reindex", dependencies=[Depends(api_key_guard)], status_code=202)
+def reindex_text(video_id: str | None = None):
+    """Queue INDEX_TEXT: one video, or a backfill of every transcript not indexed yet."""
+    job = {"type": "INDEX_TEXT", **({"video_id": video_id} if video_id else {})}
+    Redis.from_url(settings.REDIS_URL).lpush("jobs", json.dumps(job))
+    return {"jobs": ["INDEX_TEXT"]}
+
 @router.get("/{video_id}", dependencies=[Depends(api_key_guard)])
 def get_video(video_id: str, db: Session = Depends(get_db)):
     v = db.query(Video).filter(Video.id == video_id).first()
@@ -46,6 +124,17 @@ def list_moments(video_id: str, limit: int = Query(10, ge=1, le=50), db: Session
         "segment_id": s.id, "start": s.t_start, "end": s.t_end, "score": s.score, "reason": s.reason or {}
     } for s in rows]}
 
+@router.post("/{video_id}/rerank", dependencies=[Depends(api_key_guard)], status_code=202)
+def rerank_video(video_id: str, body: RerankBody = RerankBody(), db: Session = Depends(get_db)):
+    """Rescore stored windows with new weights / NMS settings: no transcription or embedding."""
+    v = db.query(Video).filter(Video.id == video_id).first()
+    if not v:
+        raise HTTPException(404, "video not found")
+    if v.status != "analyze_done":
+        raise HTTPException(409, "video not analyzed yet")
+    Redis.from_url(settings.REDIS_URL).lpush("jobs", json.dumps(rerank_job(body, video_id=video_id)))
+    return {"video_id": video_id, "jobs": ["RERANK"]}
+
 from ..models import Transcript
 from ..settings import settings
 from ..deps import api_key_guard
@@ -58,7 +147,7 @@ def suggest_titles(video_id: str, db: Session = Depends(get_db), use_llm: bool =
     if not v: raise HTTPException(404, "video not found")
     t = db.query(Transcript).filter_by(video_id=video_id).order_by(Transcript.created_at.desc()).first()
     text = t.text if t and t.text else ""
-    from ...nlp.titles import suggest_titles as _sug
+    from nlp.titles import suggest_titles as _sug
     ideas = _sug(text, extra_context=v.title or "", use_llm=use_llm)
     v.title_suggestions = ideas
     db.commit()
@@ -0,0 +1,142 @@
+"""In-process nearest-neighbour index over Segment embeddings, for semantic moment search.
+
+The index lives in the API process and is kept in step with the segment table incrementally: at
+most every SEMANTIC_REFRESH_SEC a search lists the ids of embedded segments, loads vectors only
+for ids it has not seen and tombstones ids that are gone (ANALYZE/RERANK replace candidates).
+With hnswlib installed the vectors go into an HNSW graph (inner product on unit vectors); without
+it they sit in a growable float32 matrix searched with one matrix-vector product, which is still
+a few milliseconds at 100k segments.
+
+Queries are embedded here with the same model ANALYZE uses (worker.model_registry), without pulling
+in the worker pipeline. It loads on the first search, keeping API startup fast and model-free;
+SEMANTIC_PRELOAD=1 loads it at startup instead, for deployments that serve search heavily.
+"""
+import os
+import time
+import threading
+
+SEMANTIC_BACKEND = os.getenv("SEMANTIC_BACKEND", "auto")  # auto | hnsw | numpy
+SEMANTIC_REFRESH_SEC = float(os.getenv("SEMANTIC_REFRESH_SEC", "30"))
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF = int(os.getenv("HNSW_EF", "64"))
+SEMANTIC_PRELOAD = os.getenv("SEMANTIC_PRELOAD", "0") == "1"  # load the query embedder at API startup
+LOAD_BATCH = 2000
+
+class SegmentIndex:
+    """Vectors under integer labels. Removed entries free their slot for the next add (HNSW
+    replace_deleted, or the numpy row), so the index stays the size of the live set however
+    often ANALYZE/RERANK replace a video's segments."""
+
+    def __init__(self, dim, backend="auto"):
+        import numpy as np
+        self.dim, self.ids, self.pos, self.refreshed_at = dim, {}, {}, 0.0
+        self.next, self.free = 0, []  # fresh-label counter; freed labels (numpy rows) or slots (HNSW)
+        self.hnsw = None
+        if backend in ("auto", "hnsw"):
+            try:
+                import hnswlib
+                self.hnsw = hnswlib.Index(space="ip", dim=dim)
+                self.hnsw.init_index(max_elements=1024, ef_construction=200, M=HNSW_M, allow_replace_deleted=True)
+                self.hnsw.set_ef(HNSW_EF)
+            except ImportError:
+                if backend == "hnsw":
+                    raise
+        self.mat = np.zeros((0 if self.hnsw else 1024, dim), dtype=np.float32)
+        self.alive = np.zeros(len(self.mat), dtype=bool)
+
+    def __len__(self):
+        return len(self.pos)
+
+    def _labels(self, n):
+        import numpy as np
+        fresh = np.arange(self.next, self.next + n)
+        self.next += n
+        return fresh
+
+    def add(self, ids, vecs):
+        import numpy as np
+        n, reuse = len(ids), min(len(ids), len(self.free))
+        if self.hnsw is not None:
+            # labels stay unique: a deleted slot is recycled under the new label, so none is reused
+            labels = self._labels(n)
+            need = self.hnsw.get_current_count() + n - reuse
+            if need > self.hnsw.get_max_elements():
+                self.hnsw.resize_index(max(2 * self.hnsw.get_max_elements(), need))
+            self.hnsw.add_items(vecs, labels, replace_deleted=True)
+        else:
+            labels = np.concatenate([np.asarray(self.free[len(self.free) - reuse:], dtype=np.int64),
+                                     self._labels(n - reuse)])
+            if self.next > len(self.mat):
+                grow = max(2 * len(self.mat), self.next)
+                self.mat = np.concatenate([self.mat, np.zeros((grow - len(self.mat), self.dim), dtype=np.float32)])
+                self.alive = np.concatenate([self.alive, np.zeros(grow - len(self.alive), dtype=bool)])
+            self.mat[labels] = vecs
+            self.alive[labels] = True
+        del self.free[len(self.free) - reuse:]
+        for i, label in zip(ids, labels):
+            self.pos[i], self.ids[int(label)] = int(label), i
+
+    def remove(self, ids):
+        for i in ids:
+            label = self.pos.pop(i)
+            del self.ids[label]
+            if self.hnsw is not None:
+                self.hnsw.mark_deleted(label)
+            else:
+                self.alive[label] = False
+            self.free.append(label)
+
+    def search(self, q, k):
+        """[(segment_id, cosine similarity)] best first."""
+        import numpy as np
+        k = min(k, len(self.pos))
+        if k == 0:
+            return []
+        if self.hnsw is not None:
+            labels, dist = self.hnsw.knn_query(np.asarray(q, dtype=np.float32)[None, :], k=k)
+            return [(self.ids[int(l)], 1.0 - float(d)) for l, d in zip(labels[0], dist[0])]
+        n = self.next
+        sims = np.where(self.alive[:n], self.mat[:n] @ q, -np.inf)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self.ids[int(l)], float(sims[l])) for l in top]
+
+_index = None
+_lock = threading.Lock()
+
+def preload():
+    from worker.model_registry import preload as _preload
+    _preload("embedder")
+
+def embed_query(q: str):
+    """Unit embedding of q, comparable with Segment.embedding."""
+    from worker.model_registry import get_embedder
+    return get_embedder().encode([q], normalize_embeddings=True, convert_to_numpy=True)[0]
+
+def refresh(db, force=False):
+    """Sync the index with the segment table: add new embedded segments, drop deleted ones."""
+    import numpy as np
+    from .models import Segment
+    global _index
+    with _lock:
+        if _index is not None and not force and time.time() - _index.refreshed_at < SEMANTIC_REFRESH_SEC:
+            return _index
+        live = {sid for (sid,) in db.query(Segment.id).filter(Segment.embedding.isnot(None))}
+        known = set(_index.pos) if _index is not None else set()
+        new = list(live - known)
+        for b in range(0, len(new), LOAD_BATCH):
+            rows = db.query(Segment.id, Segment.embedding).filter(Segment.id.in_(new[b:b + LOAD_BATCH])).all()
+            if not rows:
+                continue
+            vecs = np.stack([e for _, e in rows])
+            if _index is None:
+                _index = SegmentIndex(vecs.shape[1], SEMANTIC_BACKEND)
+            _index.add([sid for sid, _ in rows], vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12))
+        if _index is not None:
+            _index.remove(known - live)
+            _index.refreshed_at = time.time()
+        return _index
+
+def search(db, q, k=10):
+    index = refresh(db)
+    return index.search(q, k) if index is not None else []
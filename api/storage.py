@@ -50,3 +50,24 @@ def sign_url(object_path: str, expires_seconds: int = 3600) -> Optional[str]:
         blob = b.blob(key)
         return blob.generate_signed_url(expiration=expires_seconds, method="GET")
     return None
+
+def upload_file(local_path: str, name: str) -> tuple[str, Optional[str]]:
+    """Upload a rendered artifact according to STORAGE_BACKEND.
+
+    Returns (output_path, storage_url): a local path + /static URL for `local`,
+    or an s3:// / gs:// object path (signed on demand, so no URL) for cloud backends.
+    """
+    backend = os.getenv("STORAGE_BACKEND", "local")
+    if backend == "s3":
+        bucket = os.getenv("S3_BUCKET")
+        key = os.getenv("S3_PREFIX", "clips/") + name
+        s3_client().upload_file(local_path, bucket, key)
+        return f"s3://{bucket}/{key}", None
+    if backend == "gcs":
+        bucket = os.getenv("GCS_BUCKET")
+        key = os.getenv("GCS_PREFIX", "clips/") + name
+        gcs_client_and_signer().bucket(bucket).blob(key).upload_from_filename(local_path)
+        return f"gs://{bucket}/{key}", None
+    root = os.getenv("MEDIA_ROOT", "/data")
+    rel = os.path.relpath(local_path, root)
+    return local_path, f"/static/{rel}"
@@ -43,7 +43,7 @@ def loop():
                         # create DB video if doesn't exist
                         exists = db.query(Video).filter_by(youtube_url=url).first()
                         if not exists:
-                            v = Video(youtube_url=url, status="queued")
+                            v = Video(youtube_url=url, status="queued", channel_id=s.channel_id, title=it['title'])
                             db.add(v); db.commit(); db.refresh(v)
                             # queue ingest
                             r.lpush("jobs", f'{{"type":"INGEST","video_id":"{v.id}","youtube_url":"{v.youtube_url}"}}')
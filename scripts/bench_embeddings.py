@@ -0,0 +1,49 @@
+"""Windows/sec for the ANALYZE embedding step: per-window encode vs batched embed_texts.
+
+Usage: python -m scripts.bench_embeddings [--minutes 120] [--batch-sizes 16,32,64,128]
+Builds a synthetic transcript (~2.5 words/sec) and runs rank_segments' windowing over it.
+"""
+import argparse, random, time
+
+from worker import pipeline as P
+from worker.model_registry import get_embedder
+
+VOCAB = ("so the thing is we tried it and wow it actually worked you know what I mean "
+         "honestly nobody tells you this part but the secret is consistency!").split()
+
+def synthetic_words(minutes: float, seed: int = 0):
+    rnd = random.Random(seed)
+    t, out = 0.0, []
+    while t < minutes * 60:
+        dur = rnd.uniform(0.15, 0.5)
+        out.append({"w": " " + rnd.choice(VOCAB), "start": t, "end": t + dur})
+        t += dur + rnd.uniform(0.0, 0.25)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--minutes", type=float, default=120.0)
+    ap.add_argument("--batch-sizes", default="16,32,64,128")
+    args = ap.parse_args()
+
+    words = synthetic_words(args.minutes)
+    texts = [P.window_text(toks) for _, _, toks in P.sliding_windows(words)]
+    n = len(texts)
+    print(f"{len(words)} words, {n} windows")
+    model = get_embedder()
+    model.encode(["warmup"])
+
+    t0 = time.perf_counter()
+    for txt in texts:
+        model.encode([txt], normalize_embeddings=True)
+    base = time.perf_counter() - t0
+    print(f"per-window   : {n/base:8.1f} windows/s ({base:.2f}s)")
+
+    for bs in [int(b) for b in args.batch_sizes.split(",")]:
+        t0 = time.perf_counter()
+        P.embed_texts(texts, batch_size=bs)
+        dt = time.perf_counter() - t0
+        print(f"batch={bs:<4d}   : {n/dt:8.1f} windows/s ({dt:.2f}s, {base/dt:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Render throughput: static 9:16 crop vs single-pass face-following crop (sendcmd keyframes).
+
+Usage:
+  python -m scripts.bench_reframe --input talk.mp4 --start 60 --seconds 30
+  python -m scripts.bench_reframe --seconds 30          # synthetic 1080p testsrc input
+--track face uses compute_face_track on the input; the default sweeps the crop across the frame,
+which is the worst case for keyframe count.
+"""
+import argparse, math, os, subprocess, tempfile, time
+
+from worker.frames import probe
+from worker.pipeline import render_clip, compute_face_track, thin_track
+
+def synth_source(seconds: float, out_path: str) -> str:
+    subprocess.check_call(["ffmpeg","-y","-v","error","-f","lavfi","-i",f"testsrc2=size=1920x1080:rate=30:duration={seconds}",
+                           "-f","lavfi","-i",f"sine=frequency=440:duration={seconds}",
+                           "-c:v","libx264","-preset","ultrafast","-c:a","aac", out_path])
+    return out_path
+
+def sweep_track(scaled_w: int, seconds: float, fps: float = 10.0, crop_w: int = 1080):
+    span = max(0, scaled_w - crop_w)
+    return [(k / fps, int(span * (0.5 + 0.5 * math.sin(k / fps)))) for k in range(int(seconds * fps))]
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input")
+    ap.add_argument("--start", type=float, default=0.0)
+    ap.add_argument("--seconds", type=float, default=30.0)
+    ap.add_argument("--track", choices=("sweep", "face"), default="sweep")
+    args = ap.parse_args()
+    tmp = tempfile.mkdtemp()
+    src = args.input or synth_source(args.start + args.seconds, os.path.join(tmp, "src.mp4"))
+    start, end = args.start, args.start + args.seconds
+
+    info = probe(src)
+    scaled_w = int(round(info["width"] * 1920 / info["height"]))
+    if args.track == "face":
+        t0 = time.perf_counter()
+        scaled_w, track = compute_face_track(src, start, end)
+        print(f"face track   : {time.perf_counter() - t0:7.2f}s  {len(track)} points")
+    else:
+        track = sweep_track(scaled_w, args.seconds)
+    static = (scaled_w, max(0, (scaled_w - 1080) // 2))
+
+    t_static = timed(lambda: render_clip(src, start, end, os.path.join(tmp, "static.mp4"), crop_hint=static))
+    t_dyn = timed(lambda: render_clip(src, start, end, os.path.join(tmp, "dynamic.mp4"), crop_track=(scaled_w, track)))
+    print(f"static crop  : {t_static:7.2f}s  {args.seconds / t_static:5.1f}x realtime")
+    print(f"dynamic crop : {t_dyn:7.2f}s  {args.seconds / t_dyn:5.1f}x realtime  {len(thin_track(track))} keyframes")
+    print(f"overhead     : {100.0 * (t_dyn / t_static - 1):+.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Wall-clock: single-pass transcribe vs VAD-chunked parallel transcribe.
+
+Usage:
+  python -m scripts.bench_transcribe --input long_vod.mp4
+  python -m scripts.bench_transcribe --sample speech.wav --minutes 30   # synthetic long audio
+The synthetic mode tiles a short speech sample with 0.5-2s silences into a 16 kHz mono WAV.
+"""
+import argparse, os, random, tempfile, time, wave
+
+import numpy as np
+
+from worker import chunked_asr
+from worker.pipeline import transcribe_single
+
+def synth_long_audio(sample_path: str, minutes: float, out_path: str, seed: int = 0):
+    rnd = random.Random(seed)
+    clip = chunked_asr.load_audio(sample_path)
+    total = int(minutes * 60 * chunked_asr.SAMPLE_RATE)
+    parts, n = [], 0
+    while n < total:
+        gap = np.zeros(int(rnd.uniform(0.5, 2.0) * chunked_asr.SAMPLE_RATE), dtype=np.float32)
+        parts += [clip, gap]
+        n += len(clip) + len(gap)
+    pcm = (np.clip(np.concatenate(parts)[:total], -1, 1) * 32767).astype(np.int16)
+    with wave.open(out_path, "wb") as w:
+        w.setnchannels(1); w.setsampwidth(2); w.setframerate(chunked_asr.SAMPLE_RATE)
+        w.writeframes(pcm.tobytes())
+    return out_path
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input")
+    ap.add_argument("--sample")
+    ap.add_argument("--minutes", type=float, default=30.0)
+    ap.add_argument("--procs", type=int, default=0)
+    args = ap.parse_args()
+    if not (args.input or args.sample):
+        ap.error("pass --input <long file> or --sample <short speech clip>")
+    path = args.input or synth_long_audio(args.sample, args.minutes, os.path.join(tempfile.mkdtemp(), "synthetic.wav"))
+
+    t0 = time.perf_counter()
+    single = transcribe_single(path)
+    t_single = time.perf_counter() - t0
+    print(f"single-pass : {t_single:7.1f}s  {len(single['words'])} words")
+
+    t0 = time.perf_counter()
+    chunked = chunked_asr.transcribe_chunked(path, procs=args.procs or None)
+    t_chunked = time.perf_counter() - t0
+    print(f"chunked     : {t_chunked:7.1f}s  {len(chunked['words'])} words  procs={args.procs or chunked_asr.chunk_procs()}")
+    print(f"speedup     : {t_single / t_chunked:.2f}x")
+
+if __name__ == "__main__":
+    main()
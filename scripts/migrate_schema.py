@@ -0,0 +1,101 @@
+"""Bring a database created by an older release up to the current models.
+
+create_all only creates missing tables; it never alters existing ones. This script:
+  1. runs create_all, for new tables (transcript_chunk and its GIN index);
+  2. adds every column introduced since with ADD COLUMN IF NOT EXISTS (no table rewrite);
+  3. converts segment.embedding from a JSON float list to int8 bytea (shared/vectors.py): it adds
+     a bytea column, re-encodes the JSON vectors in batches, then swaps the columns in one
+     transaction.
+Run it with workers stopped (they write the new format). Safe to re-run: every step is skipped
+once applied.
+
+Usage:
+  python -m scripts.migrate_schema [--batch 2000]
+"""
+import argparse
+import json
+
+from sqlalchemy import text
+
+from shared.db import engine, Base
+from shared.vectors import pack
+
+# (table, column, type) added to existing tables; old rows stay NULL unless the type carries a DEFAULT
+COLUMNS = [
+    ("video", "channel_id", "text"),
+    ("video", "audio_path", "text"),
+    ("video", "proxy_path", "text"),
+    ("video", "wav_path", "text"),
+    ("video", "keyframes_path", "text"),
+    ("video", "audio_signals_path", "text"),
+    ("video", "visual_path", "text"),
+    ("video", "windows_path", "text"),
+    ("video", "title_suggestions", "json"),
+    ("video", "updated_at", "timestamp"),
+    ("clip", "render_sec", "double precision"),
+    ("clip", "preview_path", "text"),
+    ("clip", "preview_url", "text"),
+    ("clip", "preview_render_sec", "double precision"),
+    ("clip", "title", "text"),
+    ("clip", "thumbnail_path", "text"),
+    ("clip", "thumbnail_url", "text"),
+    ("clip", "thumbnail_a_path", "text"),
+    ("clip", "thumbnail_a_url", "text"),
+    ("clip", "thumbnail_b_path", "text"),
+    ("clip", "thumbnail_b_url", "text"),
+    ("clip", "ab_status", "text"),
+    ("clip", "ab_active", "text"),
+    ("clip", "ab_history", "json"),
+    ("clip", "style_variants", "json"),
+    ("clip", "updated_at", "timestamp"),
+    ("channel_sub", "nms_top_k", "integer DEFAULT 12"),
+    ("channel_sub", "nms_iou", "double precision DEFAULT 0.3"),
+    ("channel_sub", "score_weights", "json"),
+]
+
+def column_type(conn) -> str:
+    return conn.execute(text("SELECT data_type FROM information_schema.columns "
+                             "WHERE table_name = 'segment' AND column_name = 'embedding'")).scalar()
+
+def add_columns():
+    import api.models  # noqa: F401  (registers the tables on Base.metadata)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table, column, kind in COLUMNS:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {kind}"))
+    print(f"checked {len(COLUMNS)} columns")
+
+def convert_embeddings(batch):
+    with engine.begin() as conn:
+        kind = column_type(conn)
+        if kind == "bytea":
+            print("segment.embedding is already bytea")
+            return
+        conn.execute(text("ALTER TABLE segment ADD COLUMN IF NOT EXISTS embedding_bin bytea"))
+    done, last = 0, ""
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text("SELECT id, embedding::text FROM segment WHERE id::text > :last "
+                                     "AND embedding IS NOT NULL ORDER BY id::text LIMIT :n"),
+                                {"last": last, "n": batch}).all()
+            if not rows:
+                break
+            params = [{"id": sid, "b": pack(json.loads(emb))} for sid, emb in rows if emb not in (None, "null")]
+            if params:
+                conn.execute(text("UPDATE segment SET embedding_bin = :b WHERE id = :id"), params)
+            done, last = done + len(rows), str(rows[-1][0])
+            print(f"converted {done} segments")
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE segment DROP COLUMN embedding"))
+        conn.execute(text("ALTER TABLE segment RENAME COLUMN embedding_bin TO embedding"))
+    print("segment.embedding is now bytea")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=2000)
+    args = ap.parse_args()
+    add_columns()
+    convert_embeddings(args.batch)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Compact binary storage for unit embeddings.
+
+A vector is packed as a float32 scale followed by one int8 code per dimension (scale = max|x| / 127),
+so a 384-d MiniLM embedding takes 388 bytes instead of ~8 KB of JSON. Decoding is a single
+frombuffer + multiply; cosine similarity after the round trip is within ~1e-3 of the original.
+"""
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+def pack(vec) -> bytes:
+    import numpy as np
+    v = np.asarray(vec, dtype=np.float32).ravel()
+    scale = np.float32(max(float(np.abs(v).max()) if len(v) else 0.0, 1e-12) / 127.0)
+    return scale.tobytes() + np.round(v / scale).astype(np.int8).tobytes()
+
+def unpack(buf: bytes):
+    import numpy as np
+    scale = np.frombuffer(buf, dtype=np.float32, count=1)[0]
+    return np.frombuffer(buf, dtype=np.int8, offset=4).astype(np.float32) * scale
+
+class Int8Vector(TypeDecorator):
+    """bytea column holding pack()ed vectors; binds lists/arrays, loads float32 ndarrays."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else pack(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else unpack(bytes(value))
@@ -0,0 +1,104 @@
+"""Audio signals for ranking: energy, pitch variability and laughter/applause-like bursts.
+
+The 16 kHz mono track (Video.wav_path from the proxy job, else decoded from the source) is loaded
+once into a NumPy array and cut into 20 ms frames with a reshape; every measure is a vectorized
+reduction over that frame matrix:
+
+- rms:       RMS energy per second, in dBFS
+- pitch_var: variance of a zero-crossing pitch proxy over voiced frames (monotone vs animated speech)
+- onsets:    frames whose energy jumps by more than AUDIO_ONSET_DB over the previous frame
+- burst:     fraction of the second that is loud, noisy (high ZCR) and onset-dense, as laughter
+             and applause are
+
+Per-second series are saved to MEDIA_ROOT/analysis/<video id>/audio.npz for the ranker and
+bulk-inserted as Signal rows (source "audio") for the API.
+"""
+import os
+import wave
+
+SAMPLE_RATE = 16000
+FRAME = 320  # 20 ms
+FRAMES_PER_SEC = SAMPLE_RATE // FRAME
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/data")
+AUDIO_ONSET_DB = float(os.getenv("AUDIO_ONSET_DB", "6"))
+AUDIO_WEIGHT = float(os.getenv("AUDIO_WEIGHT", "0.2"))
+NAMES = ("rms", "pitch_var", "onsets", "burst")
+
+def audio_path(video_id: str) -> str:
+    return os.path.join(MEDIA_ROOT, "analysis", str(video_id), "audio.npz")
+
+def load_pcm(path: str):
+    """float32 mono samples at 16 kHz: read a 16-bit WAV directly, decode anything else."""
+    import numpy as np
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as w:
+            if w.getframerate() == SAMPLE_RATE and w.getnchannels() == 1 and w.getsampwidth() == 2:
+                return np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).astype(np.float32) / 32768.0
+    from worker.chunked_asr import load_audio
+    return load_audio(path)
+
+def per_second(x, n_sec):
+    """Mean of per-frame values over each second (trailing partial second included)."""
+    import numpy as np
+    pad = n_sec * FRAMES_PER_SEC - len(x)
+    return np.pad(x, (0, pad)).reshape(n_sec, FRAMES_PER_SEC).mean(axis=1) if n_sec else x[:0]
+
+def compute(pcm) -> dict:
+    import numpy as np
+    n = len(pcm) // FRAME
+    if n == 0:
+        return {k: np.zeros(0, dtype=np.float32) for k in NAMES}
+    frames = pcm[:n * FRAME].reshape(n, FRAME)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    db = 20.0 * np.log10(np.maximum(rms, 1e-5))
+    zcr = np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1)  # crossings per sample
+    loud = db > np.median(db)
+    voiced = loud & (zcr < 0.15)
+    pitch = zcr * SAMPLE_RATE / 2.0  # Hz, crude f0 proxy for voiced frames
+    onset = np.concatenate([[False], np.diff(db) > AUDIO_ONSET_DB])
+    n_sec = -(-n // FRAMES_PER_SEC)
+    v = per_second(voiced.astype(np.float64), n_sec)
+    p1 = per_second(np.where(voiced, pitch, 0.0), n_sec)
+    p2 = per_second(np.where(voiced, pitch ** 2, 0.0), n_sec)
+    mean_p = p1 / np.maximum(v, 1e-9)
+    pitch_var = np.where(v > 0, p2 / np.maximum(v, 1e-9) - mean_p ** 2, 0.0)
+    onsets = per_second(onset.astype(np.float64), n_sec) * FRAMES_PER_SEC
+    # burst frames: loud, noisy, within a 200 ms neighbourhood holding at least two onsets
+    dense = np.convolve(onset.astype(np.float64), np.ones(10), mode="same") >= 2
+    burst = per_second((loud & (zcr >= 0.15) & dense).astype(np.float64), n_sec)
+    energy = 10.0 * np.log10(np.maximum(per_second(rms ** 2, n_sec), 1e-10))  # dB of the second's mean power
+    return {"rms": energy.astype(np.float32), "pitch_var": np.maximum(pitch_var, 0).astype(np.float32),
+            "onsets": onsets.astype(np.float32), "burst": burst.astype(np.float32)}
+
+def save(sig: dict, out_path: str) -> str:
+    import numpy as np
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp = out_path + ".tmp.npz"
+    np.savez_compressed(tmp, **sig)
+    os.replace(tmp, out_path)
+    return out_path
+
+def signal_rows(video_id, sig: dict):
+    """Signal rows (one per second per measure) for a bulk insert."""
+    return [{"video_id": video_id, "source": "audio", "ts": float(t), "name": name, "value": float(val)}
+            for name in NAMES for t, val in enumerate(sig[name])]
+
+def load(path: str | None):
+    import numpy as np
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path) as z:
+        return {k: z[k] for k in z.files}
+
+def window_features(sig, starts, ends):
+    """Per-window means of each per-second series via prefix sums: O(1) per window."""
+    import numpy as np
+    starts, ends = np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64)
+    out = {}
+    for name in NAMES:
+        s = sig[name].astype(np.float64)
+        c = np.concatenate([[0.0], np.cumsum(s)])
+        a = np.clip(starts.astype(np.int64), 0, len(s))
+        b = np.clip(np.ceil(ends).astype(np.int64), 0, len(s))
+        out["audio_" + name] = (c[b] - c[a]) / np.maximum(b - a, 1)
+    return out
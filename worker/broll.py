@@ -0,0 +1,156 @@
+"""B-roll library: probed, pre-transcoded and duration-indexed overlay assets.
+
+refresh() scans BROLL_DIR and only touches files whose size/mtime changed: each new asset is
+probed, trimmed to BROLL_MAX_SEC and transcoded once to the overlay's render format (BROLL_WIDTH px
+wide, 30 fps, H.264, no audio, 1 s GOP) under MEDIA_ROOT/cache/broll, and its filename plus any
+tags from BROLL_DIR/tags.json are embedded. The index (index.json) keeps assets sorted by
+duration, so choose() bisects to the assets long enough for a pause and ranks only the tightest
+BROLL_FIT_WINDOW of them by cosine similarity to the clip's segment embedding.
+
+Renders never refresh inline: choose() reads the index and, when it is older than
+BROLL_REFRESH_SEC, queues a BROLL_REFRESH job (analyze stage, where the embedder is warm).
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import subprocess
+from bisect import bisect_left
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/data")
+BROLL_DIR = os.getenv("BROLL_DIR", "/app/assets/broll")
+CACHE_DIR = os.path.join(MEDIA_ROOT, "cache", "broll")
+INDEX_PATH = os.path.join(CACHE_DIR, "index.json")
+BROLL_WIDTH = int(os.getenv("BROLL_WIDTH", "360"))  # matches the PiP overlay width in render_clip
+BROLL_MAX_SEC = float(os.getenv("BROLL_MAX_SEC", "10"))
+BROLL_FIT_WINDOW = int(os.getenv("BROLL_FIT_WINDOW", "16"))
+BROLL_REFRESH_SEC = float(os.getenv("BROLL_REFRESH_SEC", "600"))
+EXTS = ('.mp4', '.mov', '.mkv', '.webm')
+_index = {"mtime": None, "data": None}
+
+def _describe(name: str, tags: dict) -> str:
+    words = re.sub(r"[_\-.]+", " ", os.path.splitext(name)[0])
+    return " ".join([words] + list(tags.get(name, [])))
+
+def _transcode(src: str, out: str) -> float:
+    from worker.frames import probe
+    dur = min(probe(src)["duration"] or BROLL_MAX_SEC, BROLL_MAX_SEC)
+    tmp = out + ".tmp.mp4"
+    subprocess.check_call(["ffmpeg","-y","-v","error","-i", src,"-t",f"{dur}","-an",
+                           "-vf",f"scale={BROLL_WIDTH}:-2,fps=30","-c:v","libx264","-preset","veryfast","-crf","20",
+                           "-pix_fmt","yuv420p","-g","30", tmp])
+    os.replace(tmp, out)
+    return dur
+
+def _read_index():
+    try:
+        with open(INDEX_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"assets": [], "refreshed_at": 0}
+
+def refresh(broll_dir: str | None = None) -> dict:
+    """Bring the index in line with the directory; returns {"added", "removed", "kept"} counts."""
+    from worker.pipeline import embed_texts
+    broll_dir = broll_dir or BROLL_DIR
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    old = {a["name"]: a for a in _read_index()["assets"]}
+    try:
+        with open(os.path.join(broll_dir, "tags.json"), encoding="utf-8") as f:
+            tags = json.load(f)
+    except (OSError, ValueError):
+        tags = {}
+    try:
+        entries = [e for e in os.scandir(broll_dir) if e.is_file() and e.name.lower().endswith(EXTS)]
+    except OSError:
+        entries = []
+    assets, new = [], []
+    for e in entries:
+        st = e.stat()
+        a = old.pop(e.name, None)
+        desc = _describe(e.name, tags)
+        if a and a["size"] == st.st_size and a["mtime_ns"] == st.st_mtime_ns and os.path.exists(a["path"]):
+            if a.get("text") != desc:  # tags changed: re-embed only
+                a["text"], a["embedding"] = desc, None
+                new.append(a)
+            assets.append(a)
+            continue
+        if a:  # changed file: drop its stale transcode
+            try:
+                os.remove(a["path"])
+            except OSError:
+                pass
+        out = os.path.join(CACHE_DIR, hashlib.sha1(f"{e.name}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest() + ".mp4")
+        try:
+            dur = _transcode(e.path, out)
+        except Exception:
+            continue  # unreadable asset: skip it, retry on the next refresh
+        a = {"name": e.name, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "path": out, "duration": dur,
+             "text": desc, "embedding": None}
+        assets.append(a)
+        new.append(a)
+    for a in old.values():  # files removed from the library
+        try:
+            os.remove(a["path"])
+        except OSError:
+            pass
+    if new:
+        for a, emb in zip(new, embed_texts([a["text"] for a in new])):
+            a["embedding"] = [round(float(x), 5) for x in emb]
+    assets.sort(key=lambda a: a["duration"])
+    tmp = INDEX_PATH + f".{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"assets": assets, "refreshed_at": time.time()}, f)
+    os.replace(tmp, INDEX_PATH)
+    return {"added": len(new), "removed": len(old), "kept": len(assets) - len(new)}
+
+def load():
+    """Index as {"durations", "paths", "emb" (n x d float32), "refreshed_at"}, re-read when it changes."""
+    import numpy as np
+    try:
+        mtime = os.path.getmtime(INDEX_PATH)
+    except OSError:
+        return None
+    if _index["mtime"] != mtime:
+        idx = _read_index()
+        assets = [a for a in idx["assets"] if a.get("embedding")]
+        _index["data"] = {"durations": [a["duration"] for a in assets], "paths": [a["path"] for a in assets],
+                          "emb": np.asarray([a["embedding"] for a in assets], dtype=np.float32),
+                          "refreshed_at": idx.get("refreshed_at", 0)}
+        _index["mtime"] = mtime
+    return _index["data"]
+
+def _request_refresh():
+    from redis import Redis
+    try:
+        r = Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+        if r.set("broll:refresh", 1, nx=True, ex=int(BROLL_REFRESH_SEC)):
+            r.lpush(os.getenv("JOBS_QUEUE", "jobs"), json.dumps({"type": "BROLL_REFRESH"}))
+    except Exception:
+        pass  # selection must never fail a render
+
+def choose(spans, query=None):
+    """One asset path per (t0, t1) span, each at least as long as its span, or [] if none fit.
+
+    Bisect to the first asset long enough, then take the best of the next BROLL_FIT_WINDOW by
+    similarity to query (a unit embedding, e.g. Segment.embedding); without a query the tightest
+    fit wins. An asset is used at most once per clip.
+    """
+    import numpy as np
+    idx = load()
+    if idx is None or time.time() - idx["refreshed_at"] > BROLL_REFRESH_SEC:
+        _request_refresh()
+    if not idx or not idx["paths"]:
+        return []
+    q = np.asarray(query, dtype=np.float32) if query is not None and len(query) == idx["emb"].shape[1] else None
+    used, out = set(), []
+    for t0, t1 in spans:
+        lo = bisect_left(idx["durations"], t1 - t0)
+        cand = [k for k in range(lo, min(lo + BROLL_FIT_WINDOW + len(used), len(idx["paths"]))) if k not in used]
+        if not cand:
+            break
+        k = cand[int(np.argmax(idx["emb"][cand] @ q))] if q is not None else cand[0]
+        used.add(k)
+        out.append(idx["paths"][k])
+    return out
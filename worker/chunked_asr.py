@@ -0,0 +1,120 @@
+"""Parallel chunked transcription for long VODs.
+
+The audio is decoded once to 16 kHz mono, split at silence boundaries found by faster-whisper's
+Silero VAD into chunks of at most ASR_CHUNK_SEC, and the chunks are transcribed in a process pool
+(created once per worker process and reused across jobs, so each child keeps its Whisper model
+warm via the model registry). Word timestamps are shifted back by each chunk's offset, so the
+result has the same {"text","words","lang"} shape as pipeline.transcribe.
+"""
+import os
+import multiprocessing as mp
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from worker.model_registry import WHISPER_LANGUAGE
+
+SAMPLE_RATE = 16000
+ASR_CHUNK_SEC = float(os.getenv("ASR_CHUNK_SEC", "120"))
+ASR_MIN_SILENCE_MS = int(os.getenv("ASR_MIN_SILENCE_MS", "500"))
+
+def chunk_procs() -> int:
+    from worker.model_registry import WHISPER_THREADS
+    return max(1, int(os.getenv("ASR_CHUNK_PROCS", "0")) or (os.cpu_count() or 1) // max(1, WHISPER_THREADS))
+
+def load_audio(path: str):
+    from faster_whisper.audio import decode_audio
+    return decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+def plan_chunks(audio, chunk_sec=None, min_silence_ms=None):
+    """Sample ranges [(s, e), ...] covering the speech, cut only in silences between VAD regions.
+
+    Consecutive speech regions are merged until adding the next one would exceed chunk_sec; a single
+    region longer than chunk_sec stays whole (Whisper windows it internally). Chunk edges are moved to
+    the middle of the surrounding silence so no word is clipped.
+    """
+    from faster_whisper.vad import get_speech_timestamps, VadOptions
+    limit = int((chunk_sec or ASR_CHUNK_SEC) * SAMPLE_RATE)
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=min_silence_ms or ASR_MIN_SILENCE_MS))
+    groups = []
+    for seg in speech:
+        if groups and seg["end"] - groups[-1][0] <= limit:
+            groups[-1][1] = seg["end"]
+        else:
+            groups.append([seg["start"], seg["end"]])
+    chunks = []
+    for k, (s, e) in enumerate(groups):
+        lo = 0 if k == 0 else (groups[k-1][1] + s) // 2
+        hi = len(audio) if k == len(groups) - 1 else (e + groups[k+1][0]) // 2
+        chunks.append((lo, hi))
+    return chunks
+
+_POOL = {"procs": 0, "pool": None}
+
+def _init():
+    from worker.model_registry import preload
+    preload("whisper")
+
+def _pool(procs):
+    """This process's chunk pool, created once and reused across jobs so each child loads Whisper
+    once (in _init) rather than once per job. Rebuilt only if the size changes or it broke."""
+    if _POOL["pool"] is None or _POOL["procs"] != procs:
+        if _POOL["pool"] is not None:
+            _POOL["pool"].shutdown(wait=False, cancel_futures=True)
+        _POOL["pool"] = ProcessPoolExecutor(max_workers=procs, mp_context=mp.get_context("spawn"), initializer=_init)
+        _POOL["procs"] = procs
+    return _POOL["pool"]
+
+def _transcribe_chunk(audio, offset_sec, language):
+    from worker.model_registry import get_whisper
+    segments, info = get_whisper().transcribe(audio, word_timestamps=True, language=language)
+    words, full = [], []
+    for seg in segments:
+        full.append(seg.text.strip())
+        for w in seg.words or []:
+            words.append({"w": w.word, "start": float(w.start) + offset_sec, "end": float(w.end) + offset_sec})
+    return " ".join(full), words, info.language, len(audio)
+
+def _chunk_results(audio, chunks, procs):
+    """Transcribe chunks, yielding (chunk, result) in time order as soon as each is available.
+    No chunks (no speech found) yields nothing; a single chunk runs in-process."""
+    if not chunks:
+        return
+    if procs < 2 or len(chunks) < 2:
+        for s, e in chunks:
+            yield (s, e), _transcribe_chunk(audio[s:e], s / SAMPLE_RATE, WHISPER_LANGUAGE)
+        return
+    pool = _pool(procs)
+    futs = [pool.submit(_transcribe_chunk, audio[s:e], s / SAMPLE_RATE, WHISPER_LANGUAGE) for s, e in chunks]
+    try:
+        for ch, f in zip(chunks, futs):
+            yield ch, f.result()
+    except BrokenProcessPool:
+        _POOL["pool"] = None  # a child died: the next job starts a fresh pool
+        raise
+    finally:
+        for f in futs:
+            f.cancel()
+
+def transcribe_stream(path: str, procs: int | None = None, audio=None):
+    """Yield (transcribed_until_sec, text, words, lang) per chunk, in order, while later chunks are
+    still being transcribed. Used by the streaming ingest to rank moments before ASR finishes."""
+    audio = load_audio(path) if audio is None else audio
+    for (s, e), (txt, words, lang, _) in _chunk_results(audio, plan_chunks(audio), procs or chunk_procs()):
+        yield e / SAMPLE_RATE, txt, words, lang
+
+def transcribe_chunked(path: str, procs: int | None = None, audio=None):
+    from worker.pipeline import transcribe_single
+    audio = load_audio(path) if audio is None else audio
+    chunks = plan_chunks(audio)
+    procs = procs or chunk_procs()
+    if len(chunks) < 2 or procs < 2:
+        return transcribe_single(path)
+    langs = Counter()
+    text, words = [], []
+    for _, (txt, ws, lang, n) in _chunk_results(audio, chunks, procs):
+        if txt:
+            text.append(txt)
+        words.extend(ws)
+        langs[lang] += n
+    return {"text": " ".join(text), "words": words, "lang": langs.most_common(1)[0][0] if langs else None}
@@ -0,0 +1,136 @@
+"""Stage-aware job executor.
+
+Every job type maps to a stage (io / asr / analyze / render / thumb). Each stage owns its own process
+pool, sized to the host's cores, so one node can transcribe a video while rendering clips for
+others. Pool processes are long-lived: the initializer warms the models a stage needs once and
+they stay loaded across jobs.
+"""
+import os
+import logging
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Callable, Dict, Any
+
+log = logging.getLogger(__name__)
+
+def setup_logging() -> None:
+    """Worker log format; pool processes are spawned, so each calls this too."""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(processName)s %(name)s: %(message)s")
+
+STAGE_OF = {
+    "INGEST": "io",
+    "INGEST_VIDEO": "io",
+    "TRANSCRIBE": "asr",
+    "ANALYZE": "analyze",
+    "ANALYZE_VISUAL": "analyze",
+    "ANALYZE_AUDIO": "analyze",
+    "PROXY": "analyze",
+    "BROLL_REFRESH": "analyze",  # transcodes new assets and embeds their names (embedder is warm here)
+    "RERANK": "analyze",  # numpy only: stored windows, no model
+    "RENDER": "render",
+    "RENDER_BATCH": "render",
+    "RENDER_CHUNK": "render",
+    "AUTO_RENDER": "io",
+    "UPLOAD_YT": "io",
+    "UPLOAD_TT": "io",
+    "THUMB_SET_YT": "io",
+    "THUMB_SET_YT_PATH": "io",
+    "ANALYTICS_REFRESH": "io",
+    "AUTOPOST_FIRE": "io",
+    "INDEX_TEXT": "io",
+    "THUMBNAILS": "thumb",  # an API request is waiting: own small pool, never behind downloads or renders
+}
+
+def pool_sizes() -> Dict[str, int]:
+    """Processes per stage. Override with POOL_IO / POOL_ASR / POOL_ANALYZE / POOL_RENDER / POOL_THUMB."""
+    cores = os.cpu_count() or 1
+    defaults = {
+        "io": 4,                        # network bound: downloads, uploads, API calls
+        # whisper uses ~4 intra-op threads per process; chunked transcription and streaming ingest
+        # fan out their own chunk pool inside the job, so one outer process is enough
+        "asr": 1 if (os.getenv("TRANSCRIBE_MODE") == "chunked" or os.getenv("INGEST_MODE") == "streaming") else max(1, cores // 4),
+        "analyze": max(1, cores // 4),
+        "render": max(1, cores // 2),   # libx264 threads well; leave headroom for ASR
+        "thumb": 1,                     # interactive thumbnail requests (one frame decode each)
+    }
+    return {s: max(1, int(os.getenv(f"POOL_{s.upper()}", n))) for s, n in defaults.items()}
+
+PRELOAD = {"asr": ("whisper",), "analyze": ("embedder",)}
+
+def _warm(stage: str) -> None:
+    """Pool initializer: load whatever the stage needs once per process."""
+    from worker import model_registry
+    setup_logging()
+    if stage in PRELOAD:
+        log.info("%s pool pid=%d models: %s", stage, os.getpid(), model_registry.preload(*PRELOAD[stage]))
+    if stage == "render":
+        import cv2  # noqa: F401
+
+class StageExecutor:
+    """Dispatch jobs to per-stage process pools and report completion via on_done(job, error, result)."""
+
+    def __init__(self, on_done: Callable[[Dict[str, Any], Exception | None, Any], None], sizes: Dict[str, int] | None = None):
+        self.on_done = on_done
+        self.sizes = sizes or pool_sizes()
+        self.ctx = mp.get_context("spawn")  # CTranslate2/torch and DB connections are not fork-safe
+        self.pools: Dict[str, ProcessPoolExecutor] = {}
+        self.inflight = {s: 0 for s in self.sizes}
+        self.lock = Lock()
+        for s in self.sizes:
+            self._start(s)
+
+    def _start(self, stage: str) -> None:
+        self.pools[stage] = ProcessPoolExecutor(max_workers=self.sizes[stage], mp_context=self.ctx,
+                                                initializer=_warm, initargs=(stage,))
+
+    @staticmethod
+    def stage_for(job: Dict[str, Any]) -> str:
+        return STAGE_OF.get(job.get("type"), "io")
+
+    def has_capacity(self, stage: str) -> bool:
+        """Allow one queued job per process so a pool never idles between completions."""
+        with self.lock:
+            return self.inflight[stage] < 2 * self.sizes[stage]
+
+    def busy(self) -> bool:
+        with self.lock:
+            return all(self.inflight[s] >= 2 * self.sizes[s] for s in self.sizes)
+
+    def submit(self, job: Dict[str, Any]) -> None:
+        from worker.jobs import run
+        stage = self.stage_for(job)
+        with self.lock:
+            self.inflight[stage] += 1
+        pool = self.pools[stage]
+        try:
+            try:
+                fut = pool.submit(run, job)
+            except BrokenProcessPool:
+                # a pool process died (OOM, segfault in a native lib): replace the pool and retry once
+                pool = self._restart(stage, pool)
+                fut = pool.submit(run, job)
+        except Exception:
+            with self.lock:  # never submitted: release the slot so the stage does not read as saturated
+                self.inflight[stage] -= 1
+            raise
+        fut.add_done_callback(lambda f, job=job, stage=stage, pool=pool: self._finish(f, job, stage, pool))
+
+    def _restart(self, stage: str, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.pools[stage] is broken:
+                self._start(stage)
+            return self.pools[stage]
+
+    def _finish(self, fut, job, stage, pool) -> None:
+        with self.lock:
+            self.inflight[stage] -= 1
+        err = fut.exception()
+        if isinstance(err, BrokenProcessPool):
+            self._restart(stage, pool)
+        self.on_done(job, err, None if err else fut.result())
+
+    def shutdown(self) -> None:
+        for p in self.pools.values():
+            p.shutdown(wait=True, cancel_futures=False)
@@ -0,0 +1,75 @@
+"""Persistent cache for face-crop hints and smoothed face tracks.
+
+Renders and the thumbnail endpoints ask for the same (source, t_start, t_end) crops over and over.
+Results are stored as small JSON sidecars under MEDIA_ROOT/cache/faces, keyed by a quick source
+fingerprint (size + hash of the first and last MiB) plus the range and detector parameters. A
+replaced or re-downloaded source changes the fingerprint, which invalidates its entries.
+mtime is deliberately not part of the key: the media cache bumps it on every access.
+"""
+import os
+import json
+import hashlib
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/data")
+CACHE_DIR = os.path.join(MEDIA_ROOT, "cache", "faces")
+_fingerprints = {}
+
+def quick_fingerprint(path: str, block: int = 1 << 20) -> str:
+    st = os.stat(path)
+    memo = _fingerprints.get(path)
+    if memo and memo[0] == (st.st_size, st.st_ino):
+        return memo[1]
+    h = hashlib.sha1(str(st.st_size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(block))
+        if st.st_size > block:
+            f.seek(max(block, st.st_size - block))
+            h.update(f.read(block))
+    _fingerprints[path] = ((st.st_size, st.st_ino), h.hexdigest())
+    return h.hexdigest()
+
+def _key(kind, path, start, end, params) -> str:
+    from worker.frames import ANALYSIS_HEIGHT
+    raw = json.dumps([kind, quick_fingerprint(path), round(float(start), 3), round(float(end), 3),
+                      sorted(params.items()), ANALYSIS_HEIGHT])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def _cached(kind, path, start, end, params, compute):
+    try:
+        key = _key(kind, path, start, end, params)
+    except OSError:
+        return compute()
+    fp = os.path.join(CACHE_DIR, key[:2], key + ".json")
+    try:
+        with open(fp, encoding="utf-8") as f:
+            return json.load(f)["value"]
+    except (OSError, ValueError, KeyError):
+        pass
+    value = compute()
+    os.makedirs(os.path.dirname(fp), exist_ok=True)
+    tmp = f"{fp}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"kind": kind, "source": path, "start": start, "end": end, "params": params, "value": value}, f)
+    os.replace(tmp, fp)
+    return value
+
+def face_crop(input_path, start, end, target_h=1920, crop_w=1080, sample_fps=2.0, visual=None):
+    """Cached pipeline.compute_face_crop -> (scaled_w, x0) or None.
+    With a visual.npz path (Video.visual_path) the stored face boxes are used and nothing is decoded."""
+    from worker import visual as V
+    vis = V.load(visual)
+    if vis is not None:
+        return V.crop_hint(vis, start, end, target_h, crop_w)
+    from worker.pipeline import compute_face_crop
+    params = {"target_h": target_h, "crop_w": crop_w, "sample_fps": sample_fps}
+    v = _cached("crop", input_path, start, end, params,
+                lambda: compute_face_crop(input_path, start, end, target_h, crop_w, sample_fps))
+    return tuple(v) if v else None
+
+def face_track(input_path, start, end, target_h=1920, crop_w=1080, sample_fps=10.0):
+    """Cached pipeline.compute_face_track -> (scaled_w, [(t, x0), ...])."""
+    from worker.pipeline import compute_face_track
+    params = {"target_h": target_h, "crop_w": crop_w, "sample_fps": sample_fps}
+    scaled_w, track = _cached("track", input_path, start, end, params,
+                              lambda: compute_face_track(input_path, start, end, target_h, crop_w, sample_fps))
+    return scaled_w, [tuple(p) for p in track]
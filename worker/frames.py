@@ -0,0 +1,60 @@
+"""Sequential low-resolution frame source for analysis.
+
+Instead of seeking with OpenCV for every sample (a keyframe seek plus decode-forward each time),
+FrameSource runs one ffmpeg process that decodes [start, end] once, drops to the sample rate and
+scales to ANALYSIS_HEIGHT, and streams raw frames over a pipe into NumPy buffers. Detectors run on
+the small frames; callers map coordinates back with .scale (analysis px -> source px).
+"""
+import os
+import json
+import subprocess
+
+ANALYSIS_HEIGHT = int(os.getenv("ANALYSIS_HEIGHT", "360"))
+
+def probe(path: str) -> dict:
+    out = subprocess.check_output(["ffprobe","-v","error","-select_streams","v:0",
+                                   "-show_entries","stream=width,height,avg_frame_rate,codec_name,pix_fmt:format=duration",
+                                   "-of","json", path])
+    info = json.loads(out)
+    st = info["streams"][0]
+    num, _, den = (st.get("avg_frame_rate") or "30/1").partition("/")
+    fps = float(num) / float(den or 1) if float(den or 1) else 30.0
+    return {"width": int(st["width"]), "height": int(st["height"]), "fps": fps or 30.0,
+            "duration": float(info.get("format", {}).get("duration") or 0.0),
+            "codec": st.get("codec_name"), "pix_fmt": st.get("pix_fmt")}
+
+class FrameSource:
+    """Iterate (t_seconds, frame) for [start, end] at `fps`, decoded once at reduced height.
+
+    pix_fmt "gray" yields HxW uint8 frames, "bgr24" yields HxWx3 (OpenCV channel order).
+    """
+
+    def __init__(self, path, start, end, fps=2.0, height=None, pix_fmt="gray", info=None):
+        self.path, self.start, self.end, self.fps, self.pix_fmt = path, float(start), float(end), float(fps), pix_fmt
+        self.info = info or probe(path)
+        self.orig_w, self.orig_h = self.info["width"], self.info["height"]
+        self.height = min(height or ANALYSIS_HEIGHT, self.orig_h)
+        self.width = max(2, int(round(self.orig_w * self.height / self.orig_h / 2.0)) * 2)
+        self.scale = self.orig_h / float(self.height)
+        self.channels = 1 if pix_fmt == "gray" else 3
+
+    def __iter__(self):
+        import numpy as np
+        cmd = ["ffmpeg","-v","error","-nostdin","-ss",f"{self.start}","-t",f"{max(0.0, self.end - self.start)}",
+               "-i", self.path, "-an","-vf",f"fps={self.fps},scale={self.width}:{self.height}",
+               "-pix_fmt", self.pix_fmt, "-f","rawvideo","-"]
+        size = self.width * self.height * self.channels
+        shape = (self.height, self.width) if self.channels == 1 else (self.height, self.width, 3)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=size * 4)
+        try:
+            k = 0
+            while True:
+                buf = proc.stdout.read(size)
+                if len(buf) < size:
+                    break
+                yield self.start + k / self.fps, np.frombuffer(buf, dtype=np.uint8).reshape(shape)
+                k += 1
+        finally:
+            proc.stdout.close()
+            proc.kill()
+            proc.wait()
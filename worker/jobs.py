@@ -0,0 +1,824 @@
+"""Job handlers. Each handler takes the decoded job dict and runs inside a stage pool process
+(see worker/executor.py). Handlers open their own DB sessions and chain follow-up jobs by
+pushing onto the Redis queue, so any worker node can pick up the next stage."""
+import os
+import json
+import time
+import logging
+from functools import lru_cache
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any
+
+from redis import Redis
+from shared.db import SessionLocal
+from api.models import Video, Transcript, TranscriptChunk, Segment, Clip, AutoPost, ChannelSub, Signal
+from worker.wordstore import WordStore
+
+log = logging.getLogger(__name__)
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/data")
+QUEUE = os.getenv("JOBS_QUEUE", "jobs")
+INGEST_MODE = os.getenv("INGEST_MODE", "full")  # full | streaming (audio first, moments while transcribing)
+STREAM_RANK_EVERY = float(os.getenv("STREAM_RANK_EVERY", "300"))  # seconds of new audio between re-ranks
+RENDER_MODE = os.getenv("RENDER_MODE", "batch")  # batch (shared decode per video) | single (one ffmpeg per clip)
+PREVIEW_TOP_K = int(os.getenv("PREVIEW_TOP_K", "6"))  # preview renders queued after ANALYZE; 0 disables
+RENDER_CHUNK_SEC = float(os.getenv("RENDER_CHUNK_SEC", "60"))  # chunk length for distributed renders
+RENDER_CHUNK_MIN_SEC = float(os.getenv("RENDER_CHUNK_MIN_SEC", "240"))  # clips at least this long are chunked; 0 disables
+DEFERRED = "deferred"  # handler result: parked until another job releases it (job_log status "deferred")
+
+def enqueue(job: Dict[str, Any], tail: bool = False) -> None:
+    """Queue a job. tail=True puts it at the far end (popped last), used to defer a job."""
+    r = Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    data = json.dumps(job, separators=(',',':'))
+    r.rpush(QUEUE, data) if tail else r.lpush(QUEUE, data)
+
+def _media(*parts) -> str:
+    path = os.path.join(MEDIA_ROOT, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def _latest_transcript(db, video_id):
+    return db.query(Transcript).filter_by(video_id=video_id).order_by(Transcript.created_at.desc()).first()
+
+@lru_cache(maxsize=8)
+def _word_store(transcript_id):
+    """Columnar transcript, cached per pool process so renders of one video share it."""
+    with SessionLocal() as db:
+        t = db.get(Transcript, transcript_id)
+        return WordStore.from_words((t.words if t else None) or [])
+
+def _set_video(video_id, **fields):
+    with SessionLocal() as db:
+        v = db.get(Video, video_id)
+        if v:
+            for k, val in fields.items():
+                setattr(v, k, val)
+            db.commit()
+
+# --- ingest / ASR / analysis -------------------------------------------------
+
+def _keyframe_index(src):
+    """Build the source's keyframe index (worker/keyframes.py) once at ingest; renders reuse it."""
+    from worker import keyframes
+    path = keyframes.index_path(src)
+    keyframes.build_index(src, path)
+    return path
+
+def ingest(job):
+    from worker import media_cache
+    vid = job["video_id"]
+    with SessionLocal() as db:
+        v = db.get(Video, vid)
+        if not v:
+            raise RuntimeError("video not found")
+        url = v.youtube_url
+    _set_video(vid, status="downloading", yt_video_id=media_cache.source_id(url))
+    if INGEST_MODE == "streaming":
+        # audio is a fraction of the mp4: start ASR on it while the video downloads in parallel
+        _set_video(vid, audio_path=media_cache.fetch(url, "audio"), status="audio_ready")
+        enqueue({"type": "INGEST_VIDEO", "video_id": vid})
+        enqueue({"type": "TRANSCRIBE", "video_id": vid, "stream": True})
+        return
+    src = media_cache.fetch(url, "mp4")
+    _set_video(vid, source_path=src, keyframes_path=_keyframe_index(src), status="downloaded")
+    enqueue({"type": "TRANSCRIBE", "video_id": vid})
+    enqueue({"type": "PROXY", "video_id": vid})
+
+def ingest_video(job):
+    """Full mp4 download for streaming ingest; only renders and visual analysis wait on this."""
+    from worker import media_cache
+    vid = job["video_id"]
+    with SessionLocal() as db:
+        url = db.get(Video, vid).youtube_url
+    src = media_cache.fetch(url, "mp4")
+    _set_video(vid, source_path=src, keyframes_path=_keyframe_index(src))
+    _release(f"wait:source:{vid}")  # renders that arrived before the mp4
+    enqueue({"type": "PROXY", "video_id": vid})
+
+def make_proxy(job):
+    """Low-res proxy + 16 kHz WAV (worker/proxy.py) for analysis; visual analysis runs on it next."""
+    from worker import media_cache, proxy
+    vid = job["video_id"]
+    with SessionLocal() as db:
+        v = db.get(Video, vid)
+        if not (v and v.source_path):
+            raise RuntimeError("video has no source yet")
+        url, src = v.youtube_url, v.source_path
+    proxy_path, wav_path = proxy.build(media_cache.ensure(url, src))
+    _set_video(vid, proxy_path=proxy_path, wav_path=wav_path)
+    enqueue({"type": "ANALYZE_VISUAL", "video_id": vid})
+    enqueue({"type": "ANALYZE_AUDIO", "video_id": vid})
+
+def _nms_params(db, v):
+    ch = db.query(ChannelSub).filter_by(channel_id=v.channel_id).first() if v and v.channel_id else None
+    return (ch and ch.nms_top_k) or 12, (ch and ch.nms_iou) or 0.3
+
+def _score_weights(db, v):
+    ch = db.query(ChannelSub).filter_by(channel_id=v.channel_id).first() if v and v.channel_id else None
+    return (ch and ch.score_weights) or None
+
+def _replace_candidates(db, vid, rows):
+    """Swap the video's candidate segments for rows, keeping segments that already have clips."""
+    used = db.query(Clip.segment_id).filter(Clip.video_id == vid, Clip.segment_id.isnot(None))
+    db.query(Segment).filter(Segment.video_id == vid, Segment.status == "candidate", ~Segment.id.in_(used)).delete(synchronize_session=False)
+    db.add_all([Segment(video_id=vid, t_start=r["start"], t_end=r["end"], score=r["score"], features=r["features"],
+                        embedding=r["embedding"], reason=r["reason"]) for r in rows])
+
+def _save_transcript(vid, res):
+    from worker import text_index
+    with SessionLocal() as db:
+        t = Transcript(video_id=vid, language=res["lang"], text=res["text"], words=res["words"])
+        db.add(t)
+        db.flush()
+        text_index.index_transcript(db, t)
+        v = db.get(Video, vid)
+        v.language = res["lang"]
+        v.status = "transcribed"
+        db.commit()
+    enqueue({"type": "ANALYZE", "video_id": vid})
+
+def transcribe(job):
+    from worker.pipeline import transcribe as _transcribe
+    vid = job["video_id"]
+    with SessionLocal() as db:
+        v = db.get(Video, vid)
+        if not (v and (v.audio_path or v.source_path)):
+            raise RuntimeError("video has no source yet")
+        url, audio, video = v.youtube_url, v.audio_path, v.source_path
+    from worker import media_cache
+    path = media_cache.ensure(url, audio, "audio") if audio else media_cache.ensure(url, video)
+    _set_video(vid, status="transcribing")
+    if not job.get("stream"):
+        _save_transcript(vid, _transcribe(path))
+        return
+    from worker import transcript_cache
+    key = transcript_cache.cache_key(path)
+    res = transcript_cache.get(key)
+    if res is None:
+        res = _transcribe_streaming(vid, path)
+        transcript_cache.put(key, res)
+    _save_transcript(vid, res)
+
+def _transcribe_streaming(vid, path):
+    """Transcribe chunk by chunk and publish provisional moments every STREAM_RANK_EVERY seconds,
+    so /videos/{id}/moments has results long before the whole file is transcribed. Only windows in
+    the newly transcribed span are embedded; they are merged with earlier picks by NMS."""
+    from collections import Counter
+    from worker.chunked_asr import transcribe_stream
+    from worker.pipeline import rank_segments, select_segments, WINDOW_LENS
+    with SessionLocal() as db:
+        top_k, iou_thr = _nms_params(db, db.get(Video, vid))
+    words, text, langs = [], [], Counter()
+    picks, ranked_to = [], 0.0
+    for done, txt, ws, lang in transcribe_stream(path):
+        words.extend(ws)
+        if txt:
+            text.append(txt)
+        langs[lang] += 1
+        if done - ranked_to < STREAM_RANK_EVERY:
+            continue
+        span = WordStore.from_words(words).range(max(0.0, ranked_to - max(WINDOW_LENS)), done)
+        pool = picks + rank_segments(span, top_k=top_k, iou_thr=iou_thr)
+        picks = [{**pool[k], "reason": {**pool[k]["reason"], **reason, "provisional": True}}
+                 for k, reason in select_segments([r["start"] for r in pool], [r["end"] for r in pool], [r["score"] for r in pool], top_k, iou_thr)]
+        ranked_to = done
+        with SessionLocal() as db:
+            _replace_candidates(db, vid, picks)
+            db.commit()
+    return {"text": " ".join(text), "words": words, "lang": langs.most_common(1)[0][0] if langs else None}
+
+def analyze(job):
+    from worker.pipeline import rank_table, score_windows, pick_windows
+    from worker import visual, audio, windows
+    vid = job["video_id"]
+    with SessionLocal() as db:
+        t = _latest_transcript(db, vid)
+        if not t:
+            raise RuntimeError("no transcript for video")
+        v = db.get(Video, vid)
+        top_k, iou_thr = _nms_params(db, v)
+        tab, embs = rank_table(t.words or [], visual=visual.load(v.visual_path), audio=audio.load(v.audio_signals_path))
+        v.windows_path = windows.save(tab, embs, t.id, windows.windows_path(vid))
+        _replace_candidates(db, vid, pick_windows(tab, embs, score_windows(tab, _score_weights(db, v)), top_k, iou_thr))
+        v.status = "analyze_done"
+        db.commit()
+    if PREVIEW_TOP_K > 0 and not job.get("rerun"):
+        enqueue({"type": "AUTO_RENDER", "video_id": vid, "top_k": PREVIEW_TOP_K, "tier": "preview"})
+
+def rerank(job):
+    """Rescore and re-NMS stored windows (worker/windows.py) for one video ({"video_id"}) or every
+    analyzed video of a channel ({"channel_id"}). Optional "weights", "top_k" and "iou_thr" override
+    the channel's settings. Videos without a current windows.npz fall back to a full ANALYZE."""
+    from worker import visual, audio, windows
+    with SessionLocal() as db:
+        q = db.query(Video).filter(Video.status == "analyze_done")
+        q = q.filter(Video.id == job["video_id"]) if job.get("video_id") else q.filter(Video.channel_id == job["channel_id"])
+        fallback = []
+        for v in q.all():
+            t = _latest_transcript(db, v.id)
+            stored = windows.load(v.windows_path, t.id) if t else None
+            if stored is None:
+                fallback.append(v.id)
+                continue
+            top_k, iou_thr = _nms_params(db, v)
+            rows = windows.rerank(stored, visual.load(v.visual_path), audio.load(v.audio_signals_path),
+                                  job.get("weights") or _score_weights(db, v),
+                                  top_k if job.get("top_k") is None else job["top_k"],
+                                  iou_thr if job.get("iou_thr") is None else job["iou_thr"])
+            _replace_candidates(db, v.id, rows)
+            db.commit()
+    for vid in fallback:
+        enqueue({"type": "ANALYZE", "video_id": vid, "rerun": True})
+
+def index_text(job):
+    """Build search chunks for one video ({"video_id"}) or backfill every video whose latest
+    transcript is not indexed yet."""
+    from worker import text_index
+    with SessionLocal() as db:
+        q = db.query(Video.id)
+        if job.get("video_id"):
+            q = q.filter(Video.id == job["video_id"])
+        for (vid,) in q.all():
+            t = _latest_transcript(db, vid)
+            if not t or (not job.get("video_id") and db.query(TranscriptChunk.id).filter_by(transcript_id=t.id).first()):
+                continue
+            text_index.index_transcript(db, t)
+            db.commit()
+
+def analyze_visual(job):
+    """One low-res decode of the proxy (or source) -> scene cuts, motion energy and face boxes
+    (worker/visual.py). If the transcript was already ranked without them, RERANK is queued."""
+    from worker import media_cache, visual, proxy
+    vid = job["video_id"]
+    with SessionLocal() as db:
+        v = db.get(Video, vid)
+        if not (v and v.source_path):
+            raise RuntimeError("video has no source yet")
+        url, src, proxy_path = v.youtube_url, v.source_path, v.proxy_path
+    path = proxy.analysis_path(proxy_path, None) or media_cache.ensure(url, src)
+    path = visual.analyze_source(path, visual.visual_path(vid))
+    with SessionLocal() as db:
+        v = db.get(Video, vid)
+        v.visual_path = path
+        ranked = v.status == "analyze_done"
+        db.commit()
+    if ranked:
+        enqueue({"type": "RERANK", "video_id": vid})
+
+def analyze_audio(job):
+    """Energy / pitch-variance / burst series from the 16 kHz track (worker/audio.py), stored as
+    audio.npz for the ranker and bulk-inserted as Signal rows. Queues RERANK like analyze_visual."""
+    from sqlalchemy import insert
+    from worker import media_cache, audio
+    vid = job["video_id"]
+    with SessionLocal() as db:
+        v = db.get(Video, vid)
+        if not v:
+            raise RuntimeError("video not found")
+        url, wav, track, src = v.youtube_url, v.wav_path, v.audio_path, v.source_path
+    if wav and os.path.exists(wav):
+        path = wav
+    else:
+        path = media_cache.ensure(url, track, "audio") if track else media_cache.ensure(url, src)
+    sig = audio.compute(audio.load_pcm(path))
+    out = audio.save(sig, audio.audio_path(vid))
+    with SessionLocal() as db:
+        db.query(Signal).filter_by(video_id=vid, source="audio").delete(synchronize_session=False)
+        rows = audio.signal_rows(vid, sig)
+        if rows:
+            db.execute(insert(Signal), rows)
+        v = db.get(Video, vid)
+        v.audio_signals_path = out
+        ranked = v.status == "analyze_done"
+        db.commit()
+    if ranked:
+        enqueue({"type": "RERANK", "video_id": vid})
+
+# --- rendering ---------------------------------------------------------------
+
+def _prepare_render(job):
+    """Load a clip's render inputs and build its captions/crop/B-roll plan. None if deferred.
+    job["tier"] == "preview" renders the cheap approval preview: no B-roll, static crop, low res."""
+    from worker import pipeline as P
+    clip_id = job["clip_id"]
+    tier = job.get("tier") or "full"
+    opts = job.get("opts") or {}
+    if tier == "preview":
+        opts = {**opts, "broll_on_pauses": False, "dynamic_reframe": False}
+    with SessionLocal() as db:
+        c = db.get(Clip, clip_id)
+        if not c:
+            raise RuntimeError("clip not found")
+        v = db.get(Video, c.video_id)
+        s = db.get(Segment, c.segment_id) if c.segment_id else None
+        if not (v and v.source_path):
+            if v and v.audio_path:
+                # streaming ingest: the mp4 is still downloading; INGEST_VIDEO re-queues this job
+                _park(f"wait:source:{v.id}", job)
+                db.expire_all()
+                if db.get(Video, v.id).source_path:  # landed while parking
+                    _release(f"wait:source:{v.id}")
+                return None
+            raise RuntimeError("video has no source yet")
+        start = float(job.get("start", s.t_start if s else 0.0))
+        end = float(job.get("end", s.t_end if s else start + 30.0))
+        aspect = job.get("aspect_ratio") or c.aspect_ratio or "9:16"
+        style = c.caption_style or {}
+        t = _latest_transcript(db, v.id)
+        tid = t.id if t else None
+        src, url, title, vis_path = v.source_path, v.youtube_url, c.title or v.title, v.visual_path
+        proxy_path, kf_path = v.proxy_path, v.keyframes_path
+        seg_emb = s.embedding if s else None
+        c.status = "previewing" if tier == "preview" else "rendering"
+        db.commit()
+
+    from worker import media_cache, face_cache, visual, proxy
+    src = media_cache.ensure(url, src)  # re-fetches the source if the cache evicted it
+    fast = proxy.analysis_path(proxy_path, src)  # face analysis and previews decode the proxy
+    vis = visual.load(vis_path)
+    if vis is not None and opts.get("snap_to_cuts", True):
+        start, end = visual.snap_range(vis, start, end)
+    words = _word_store(tid) if tid else WordStore.coerce([])
+    sub_path = None
+    if len(words.range(start, end)) and style.get("captions", True):
+        sub_path = _media("clips", f"{clip_id}.ass")
+        P.to_ass(words, sub_path, keywords=style.get("keywords"), start=start, end=end,
+                 **{k: style[k] for k in ("font", "font_size", "primary_color", "emphasis_color") if k in style})
+    crop_hint, crop_track = None, None
+    if aspect == "9:16" and opts.get("dynamic_reframe"):
+        try:
+            crop_track = face_cache.face_track(fast, start, end)
+        except Exception:
+            crop_track = None
+        if not (crop_track and crop_track[1]):
+            crop_track = None
+    if aspect == "9:16" and opts.get("face_reframe", True) and crop_track is None:
+        try:
+            crop_hint = face_cache.face_crop(fast, start, end, visual=vis_path)
+        except Exception:
+            crop_hint = None
+    broll = None
+    if opts.get("broll_on_pauses"):
+        from worker import broll as B
+        spans = P.find_pauses(words, start, end)
+        files = B.choose(spans, query=seg_emb)
+        broll = [(f, t0 - start, t1 - start) for f, (t0, t1) in zip(files, spans)] or None
+    out = _media("clips", f"{clip_id}.preview.mp4" if tier == "preview" else f"{clip_id}.mp4")
+    return {"clip_id": clip_id, "tier": tier, "src": fast if tier == "preview" else src, "start": start, "end": end, "out": out,
+            "aspect": aspect, "srt_path": sub_path, "crop_hint": crop_hint, "crop_track": crop_track,
+            "broll": broll, "title": title, "at": visual.thumb_time(vis, start, end),
+            "keyframes": kf_path if tier == "full" else None}
+
+def _smart_cut_ok(r, opts):
+    from worker import pipeline as P
+    return opts.get("smart_cut", True) and P.smart_cut_ok(r["src"], r["aspect"], r["srt_path"], r["crop_hint"],
+                                                           r["crop_track"], r["broll"], r["tier"])
+
+def _render_one(r, opts=None):
+    from worker import pipeline as P
+    t0 = time.perf_counter()
+    if _smart_cut_ok(r, opts or {}):
+        from worker.keyframes import load_index
+        P.smart_cut(r["src"], r["start"], r["end"], r["out"], load_index(r["src"], r["keyframes"]))
+    else:
+        P.render_clip(r["src"], r["start"], r["end"], r["out"], r["aspect"], r["srt_path"], r["crop_hint"],
+                      broll=r["broll"], crop_track=r["crop_track"], quality=r["tier"])
+    r["render_sec"] = time.perf_counter() - t0
+
+def _finish_render(r):
+    """Thumbnail (unless the clip already has one), upload, and record the artifact for its tier."""
+    from worker import pipeline as P
+    from api.storage import upload_file
+    clip_id, crop_hint, crop_track = r["clip_id"], r["crop_hint"], r["crop_track"]
+    with SessionLocal() as db:
+        current = db.get(Clip, clip_id).thumbnail_path
+    # keep chosen thumbnails; a preview's proxy thumbnail is replaced by the full render's
+    name = f"{clip_id}.preview.jpg" if r["tier"] == "preview" else f"{clip_id}.jpg"
+    thumb = None
+    if not current or (r["tier"] == "full" and current.endswith(".preview.jpg")):
+        if crop_track:
+            # thumbnails use a static crop: the track position at the thumbnail frame
+            crop_hint = (crop_track[0], min(crop_track[1], key=lambda p: abs(p[0] - (r["at"] - r["start"])))[1])
+        thumb = _media("thumbnails", name)
+        try:
+            P.generate_thumbnail(r["src"], r["start"], r["end"], thumb, r["aspect"], crop_hint, r["title"], at=r["at"])
+        except Exception:
+            thumb = None
+    output_path, storage_url = upload_file(r["out"], os.path.basename(r["out"]))
+
+    with SessionLocal() as db:
+        c = db.get(Clip, clip_id)
+        if r["tier"] == "preview":
+            c.preview_path, c.preview_url, c.preview_render_sec = output_path, storage_url, r.get("render_sec")
+            if c.status == "previewing":  # a full render may have been queued meanwhile
+                c.status = "preview_ready"
+        else:
+            c.output_path, c.storage_url, c.render_sec, c.status = output_path, storage_url, r.get("render_sec"), "rendered"
+        if thumb:
+            c.thumbnail_path, c.thumbnail_url = thumb, f"/static/thumbnails/{name}"
+        db.commit()
+    if r["tier"] == "full":
+        _release(f"wait:render:{clip_id}")  # publish jobs waiting on this render
+
+def _redis():
+    return Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+
+def _park(key, job):
+    """Hold job on the Redis list key until _release(key) re-queues it, instead of re-queueing
+    it in a loop. Parked jobs are dropped after a day if nothing releases them."""
+    red = _redis()
+    red.rpush(key, json.dumps(job, separators=(',',':')))
+    red.expire(key, 86400)
+
+def _release(key):
+    """Re-queue every job parked on key (atomically taken, so each runs once)."""
+    red = _redis()
+    with red.pipeline() as p:
+        p.lrange(key, 0, -1)
+        p.delete(key)
+        jobs, _ = p.execute()
+    for data in jobs:
+        red.lpush(QUEUE, data)
+
+def _mark_failed(clip_id):
+    """Record a failed render so the clip stops pinning its source in the media cache."""
+    with SessionLocal() as db:
+        c = db.get(Clip, clip_id)
+        if c:
+            c.status = "failed"
+            db.commit()
+
+def render(job):
+    try:
+        r = _prepare_render(job)
+        if r is None:
+            return
+        opts = job.get("opts") or {}
+        if _chunkable(r, opts):
+            _dispatch_chunks(r)
+            return
+        _render_one(r, opts)
+        _finish_render(r)
+    except Exception:
+        _mark_failed(job["clip_id"])
+        raise
+
+def _chunkable(r, opts):
+    # smart-cut renders are mostly stream copy; splitting them would only add re-encoded seams
+    return (RENDER_CHUNK_MIN_SEC > 0 and r["end"] - r["start"] >= RENDER_CHUNK_MIN_SEC
+            and not r["broll"] and opts.get("chunked", True) and not _smart_cut_ok(r, opts))
+
+def _dispatch_chunks(r):
+    """Split a long render at source keyframes into RENDER_CHUNK jobs any worker can pick up.
+
+    The plan lives in Redis (render:chunks:<clip>); each finished chunk bumps a counter and the
+    worker that completes the last one concatenates the parts and finishes the clip."""
+    from worker.keyframes import load_index, split_points
+    pts = split_points(load_index(r["src"], r["keyframes"]), r["start"], r["end"], RENDER_CHUNK_SEC)
+    if len(pts) < 3:
+        _render_one(r)
+        _finish_render(r)
+        return
+    key = f"render:chunks:{r['clip_id']}"
+    red = _redis()
+    red.delete(key)
+    red.hset(key, mapping={"plan": json.dumps(r), "points": json.dumps(pts), "done": 0,
+                           "t0": time.time()})
+    red.expire(key, 86400)
+    for k in range(len(pts) - 1):
+        enqueue({"type": "RENDER_CHUNK", "clip_id": r["clip_id"], "chunk": k})
+
+def _fail_chunks(r, key, n_parts):
+    """A chunk (or the concat) failed: drop the plan and every part, and mark the clip failed so its
+    media is no longer pinned. Chunks still queued or running find no plan and stop."""
+    _redis().delete(key)
+    for i in range(n_parts):
+        try:
+            os.remove(os.path.join(MEDIA_ROOT, "clips", f"{r['clip_id']}.part{i:03d}.mp4"))
+        except OSError:
+            pass
+    _mark_failed(r["clip_id"])
+
+def render_chunk(job):
+    from worker import pipeline as P
+    key = f"render:chunks:{job['clip_id']}"
+    red = _redis()
+    plan, points = red.hmget(key, "plan", "points")
+    if plan is None:
+        return  # plan dropped: another chunk failed (the clip is marked failed) or it expired
+    r, pts, k = json.loads(plan), json.loads(points), int(job["chunk"])
+    part = _media("clips", f"{r['clip_id']}.part{k:03d}.mp4")
+    try:
+        P.render_chunk(r["src"], pts[k], pts[k+1], pts[k] - r["start"], part, r["aspect"], r["srt_path"],
+                       r["crop_hint"], r["crop_track"], quality=r["tier"])
+        if not red.exists(key):  # failed elsewhere while this chunk rendered
+            os.remove(part)
+            return
+        if red.hincrby(key, "done", 1) < len(pts) - 1:
+            return
+        # last chunk in: join the parts (video stream copy) and finish the clip here
+        parts = [_media("clips", f"{r['clip_id']}.part{i:03d}.mp4") for i in range(len(pts) - 1)]
+        P.concat_chunks(parts, r["src"], r["start"], r["end"], r["out"], quality=r["tier"])
+        r["render_sec"] = time.time() - float(red.hget(key, "t0"))
+    except Exception:
+        _fail_chunks(r, key, len(pts) - 1)
+        raise
+    for p in parts:
+        os.remove(p)
+    red.delete(key)
+    try:
+        _finish_render(r)
+    except Exception:
+        _mark_failed(r["clip_id"])
+        raise
+
+def render_batch(job):
+    """Render several clips of one video from shared decodes (pipeline.render_batch).
+
+    Clips are grouped by pipeline.plan_batches; each group is one ffmpeg process that decodes the
+    group's span once and encodes every clip in it. Clips with B-roll overlays render on their own,
+    and if a grouped render fails its clips are retried one by one. A group's wall-clock is split
+    evenly across its clips for render_sec. A clip that fails on its own is marked failed and the
+    rest of the batch carries on; the job raises at the end if any clip failed."""
+    from worker import pipeline as P
+    opts = job.get("opts") or {}
+    tier = job.get("tier") or "full"
+    items = [{"type": "RENDER", "video_id": job["video_id"], **it, "opts": opts, "tier": tier} for it in job["items"]]
+    failed = []
+
+    def attempt(clip_id, fn, *args):
+        try:
+            return fn(*args)
+        except Exception:
+            log.exception("render of clip %s failed", clip_id)
+            _mark_failed(clip_id)
+            failed.append(clip_id)
+
+    # clips whose source is still downloading are parked as single RENDER jobs until INGEST_VIDEO releases them
+    plans = [r for r in (attempt(it["clip_id"], _prepare_render, it) for it in items) if r]
+    rest, solo = [], []
+    for r in plans:
+        if _chunkable(r, opts):
+            attempt(r["clip_id"], _dispatch_chunks, r)  # long clips fan out across workers instead
+        elif r["broll"] or _smart_cut_ok(r, opts):
+            solo.append(r)
+        else:
+            rest.append(r)
+    for group in P.plan_batches(rest):
+        t0 = time.perf_counter()
+        try:
+            P.render_batch(group[0]["src"], group, quality=tier)
+        except Exception:
+            log.exception("batch render of %d clips failed; retrying them one by one", len(group))
+            solo.extend(group)
+            continue
+        for r in group:
+            r["render_sec"] = (time.perf_counter() - t0) / len(group)
+            attempt(r["clip_id"], _finish_render, r)
+    for r in solo:
+        attempt(r["clip_id"], _render_one, r, opts)
+        if r["clip_id"] not in failed:
+            attempt(r["clip_id"], _finish_render, r)
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(items)} clips failed: {', '.join(map(str, failed))}")
+
+def auto_render(job):
+    """Create clips for the top-k candidate segments of a video and queue their renders.
+
+    tier "preview" (queued after ANALYZE) renders cheap previews for approval. A full-tier run
+    first upgrades the video's existing preview clips, best segment first, then adds new ones."""
+    vid = job["video_id"]
+    opts = job.get("opts") or {}
+    tier = job.get("tier") or "full"
+    top_k = int(job.get("top_k") or 3)
+    with SessionLocal() as db:
+        items = []
+        if tier == "full":
+            previews = (db.query(Clip, Segment).join(Segment, Clip.segment_id == Segment.id)
+                        .filter(Clip.video_id == vid, Clip.status == "preview_ready")
+                        .order_by(Segment.score.desc().nullslast()).limit(top_k).all())
+            for c, s in previews:
+                c.status = "queued"
+                items.append({"clip_id": c.id, "segment_id": s.id, "start": s.t_start, "end": s.t_end, "aspect_ratio": c.aspect_ratio})
+        segs = (db.query(Segment).filter_by(video_id=vid, status="candidate")
+                .order_by(Segment.score.desc().nullslast()).limit(max(0, top_k - len(items))).all())
+        for s in segs:
+            c = Clip(video_id=vid, segment_id=s.id, aspect_ratio=opts.get("aspect_ratio", "9:16"), caption_style=opts.get("caption_style") or {})
+            db.add(c)
+            s.status = "selected"
+            db.flush()
+            items.append({"clip_id": c.id, "segment_id": s.id, "start": s.t_start, "end": s.t_end, "aspect_ratio": c.aspect_ratio})
+        db.commit()
+    for j in render_jobs(vid, items, opts, tier):
+        enqueue(j)
+
+def render_jobs(video_id, items, opts=None, tier="full"):
+    """RENDER jobs for items, or a single RENDER_BATCH when RENDER_MODE=batch and there are several."""
+    if RENDER_MODE == "batch" and len(items) > 1:
+        return [{"type": "RENDER_BATCH", "video_id": video_id, "items": items, "opts": opts or {}, "tier": tier}]
+    return [{"type": "RENDER", "video_id": video_id, **it, "opts": opts or {}, "tier": tier} for it in items]
+
+def full_render_job(c: Clip, s: Segment | None, opts=None):
+    """RENDER job that produces the full-quality artifact for an existing (e.g. previewed) clip."""
+    item = {"clip_id": c.id, "aspect_ratio": c.aspect_ratio}
+    if s:
+        item.update(segment_id=s.id, start=s.t_start, end=s.t_end)
+    return {"type": "RENDER", "video_id": c.video_id, **item, "opts": opts or {}, "tier": "full"}
+
+def thumbnails(job):
+    """Render thumbnail variants for a clip and reply on job["reply"] (the API waits on that key).
+
+    job: clip_id, aspect_ratio, variants [{"key", "title", "path"}]. The frame is extracted once at
+    the clip's thumbnail time with its face crop; every variant is composed from it in memory."""
+    from worker import face_cache, media_cache, visual, proxy, thumbnails as T
+    reply = job.get("reply")
+    try:
+        with SessionLocal() as db:
+            c = db.get(Clip, job["clip_id"])
+            v = db.get(Video, c.video_id) if c else None
+            s = db.get(Segment, c.segment_id) if c and c.segment_id else None
+            if not (v and s and v.source_path):
+                raise RuntimeError("clip missing video/segment")
+            url, src, proxy_path, vis_path, t0, t1 = v.youtube_url, v.source_path, v.proxy_path, v.visual_path, s.t_start, s.t_end
+        src = media_cache.ensure(url, src)  # the cache may have evicted the source since the clip rendered
+        aspect = job.get("aspect_ratio") or "9:16"
+        crop_hint = None
+        if aspect == "9:16":
+            try:
+                crop_hint = face_cache.face_crop(proxy.analysis_path(proxy_path, src), t0, t1, visual=vis_path)
+            except Exception:
+                crop_hint = None
+        at = visual.thumb_time(visual.load(vis_path), t0, t1)
+        T.render_variants(src, at, job["variants"], aspect, crop_hint)
+        result = {"ok": True, "paths": [var["path"] for var in job["variants"]]}
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+        raise
+    finally:
+        if reply:
+            red = _redis()
+            red.lpush(reply, json.dumps(result))
+            red.expire(reply, 300)
+
+def broll_refresh(job):
+    from worker import broll
+    broll.refresh()
+
+# --- publishing --------------------------------------------------------------
+
+def _await_full_render(job, db, c: Clip) -> bool:
+    """Publishing needs the full-quality file: queue it if the clip only has a preview and park the
+    publish job until _finish_render releases it. Returns True if the job was parked."""
+    path = os.path.join(MEDIA_ROOT, "clips", f"{c.id}.mp4")
+    if c.output_path and os.path.exists(path):  # output_path is only set once the render finished
+        return False
+    if int(job.get("deferred", 0)) >= 3:  # released by full renders that never produced the file
+        raise RuntimeError("clip has no full render")
+    if c.status not in ("queued", "rendering"):
+        enqueue(full_render_job(c, db.get(Segment, c.segment_id) if c.segment_id else None))
+        c.status = "queued"
+        db.commit()
+    key = f"wait:render:{c.id}"
+    _park(key, {**job, "deferred": int(job.get("deferred", 0)) + 1})
+    db.refresh(c)
+    if c.output_path and os.path.exists(path):  # finished while parking
+        _release(key)
+    return True
+
+def _local_clip(c: Clip) -> str:
+    path = os.path.join(MEDIA_ROOT, "clips", f"{c.id}.mp4")
+    if not os.path.exists(path):
+        raise RuntimeError("clip has no local render")
+    return path
+
+def upload_yt(job):
+    from publisher.youtube import upload_youtube
+    from publisher.thumbs import set_thumbnail
+    with SessionLocal() as db:
+        c = db.get(Clip, job["clip_id"])
+        if not c:
+            raise RuntimeError("clip not found")
+        if _await_full_render(job, db, c):
+            return DEFERRED
+        yt_id = upload_youtube(_local_clip(c), job.get("meta") or {})
+        c.metrics = {**(c.metrics or {}), "youtube": {"videoId": yt_id}}
+        db.commit()
+        if c.thumbnail_path and os.path.exists(c.thumbnail_path):
+            set_thumbnail(yt_id, c.thumbnail_path)
+
+def upload_tt(job):
+    from publisher.tiktok import upload_tiktok
+    with SessionLocal() as db:
+        c = db.get(Clip, job["clip_id"])
+        if not c:
+            raise RuntimeError("clip not found")
+        if _await_full_render(job, db, c):
+            return DEFERRED
+        tt_id = upload_tiktok(_local_clip(c), (job.get("meta") or {}).get("title", ""))
+        c.metrics = {**(c.metrics or {}), "tiktok": {"videoId": tt_id}}
+        db.commit()
+
+def thumb_set_yt(job):
+    """Switch the live YouTube thumbnail to A/B variant (THUMB_SET_YT) or an explicit image (THUMB_SET_YT_PATH)."""
+    from publisher.thumbs import set_thumbnail
+    with SessionLocal() as db:
+        c = db.get(Clip, job["clip_id"])
+        if not c:
+            raise RuntimeError("clip not found")
+        yt_id = ((c.metrics or {}).get("youtube") or {}).get("videoId")
+        if not yt_id:
+            raise RuntimeError("clip not published to YouTube")
+        variant = job.get("variant")
+        path = job.get("image_path") or (c.thumbnail_a_path if variant == "A" else c.thumbnail_b_path)
+        if not path:
+            raise RuntimeError("no thumbnail to set")
+        set_thumbnail(yt_id, path)
+        if variant:
+            c.ab_active = variant
+            c.ab_history = (c.ab_history or []) + [{"ts": datetime.now(timezone.utc).isoformat(), "event": "switch", "variant": variant}]
+        db.commit()
+
+def analytics_refresh(job):
+    from publisher.analytics import get_video_stats, get_video_impressions
+    with SessionLocal() as db:
+        clips = [c for c in db.query(Clip).all() if ((c.metrics or {}).get("youtube") or {}).get("videoId")]
+        ids = [c.metrics["youtube"]["videoId"] for c in clips]
+        if not ids:
+            return
+        stats = get_video_stats(ids)
+        day = (datetime.now(timezone.utc) - timedelta(days=1)).date().isoformat()
+        try:
+            impr = get_video_impressions(ids, day, day)
+        except Exception:
+            impr = {}
+        today = datetime.now(timezone.utc).date().isoformat()
+        for c in clips:
+            vid = c.metrics["youtube"]["videoId"]
+            if vid not in stats:
+                continue
+            point = {"date": today, **stats[vid]}
+            if vid in impr:
+                point["impressions_day"] = impr[vid]["impressions"]
+            series = [p for p in (c.metrics.get("youtube_timeseries") or []) if p.get("date") != today]
+            c.metrics = {**c.metrics, "youtube_timeseries": series + [point]}
+        db.commit()
+
+def autopost_fire(job):
+    from api.routes.analytics import _views_24h
+    with SessionLocal() as db:
+        ap = db.get(AutoPost, job["autopost_id"])
+        if not ap:
+            raise RuntimeError("autopost not found")
+        ranked = sorted(db.query(Clip).all(), key=lambda c: _views_24h(c.metrics), reverse=True)
+        if not ranked:
+            return
+        def item(c):
+            v = db.get(Video, c.video_id)
+            yt = (c.metrics or {}).get("youtube") or {}
+            url = f"https://youtu.be/{yt['videoId']}" if yt.get("videoId") else (c.storage_url or "")
+            return {"clip_id": c.id, "title": c.title or (v.title if v else None) or "Clip", "views_24h": _views_24h(c.metrics),
+                    "url": url, "thumbnail_url": c.thumbnail_url, "youtube": yt}
+        if ap.platform == "email":
+            from publisher.emailer import send_email
+            rows = "".join(f"<li><a href='{it['url']}'>{it['title']}</a> — {it['views_24h']} views</li>" for it in map(item, ranked[:5]))
+            send_email("Top 5 Clips (24h)", f"<h2>Top 5 Clips (24h)</h2><ol>{rows}</ol>", [e.strip() for e in (ap.endpoint or "").split(",") if e.strip()])
+            return
+        top = item(ranked[0])
+        caption = (ap.template or "{title} {url}").format(**top)
+        if ap.platform == "x":
+            from publisher.x_post import post_text
+            post_text(caption)
+        else:
+            from monitor.senders import send_webhook
+            send_webhook(ap.endpoint, {**top, "caption": caption})
+
+HANDLERS = {
+    "INGEST": ingest,
+    "INGEST_VIDEO": ingest_video,
+    "PROXY": make_proxy,
+    "TRANSCRIBE": transcribe,
+    "ANALYZE": analyze,
+    "ANALYZE_VISUAL": analyze_visual,
+    "ANALYZE_AUDIO": analyze_audio,
+    "RENDER": render,
+    "RENDER_BATCH": render_batch,
+    "RENDER_CHUNK": render_chunk,
+    "AUTO_RENDER": auto_render,
+    "UPLOAD_YT": upload_yt,
+    "UPLOAD_TT": upload_tt,
+    "THUMB_SET_YT": thumb_set_yt,
+    "THUMB_SET_YT_PATH": thumb_set_yt,
+    "ANALYTICS_REFRESH": analytics_refresh,
+    "AUTOPOST_FIRE": autopost_fire,
+    "THUMBNAILS": thumbnails,
+    "BROLL_REFRESH": broll_refresh,
+    "RERANK": rerank,
+    "INDEX_TEXT": index_text,
+}
+
+def run(job: Dict[str, Any]):
+    """Entry point executed inside a stage pool process. Returns DEFERRED if the job was parked."""
+    fn = HANDLERS.get(job.get("type"))
+    if fn is None:
+        raise ValueError(f"unknown job type: {job.get('type')}")
+    return fn(job)
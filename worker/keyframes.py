@@ -0,0 +1,72 @@
+"""Keyframe index of a source video.
+
+ffprobe lists the video packets flagged as keyframes (no decoding), giving the GOP boundaries where
+a seek is exact and cheap. The index is an .npz of keyframe timestamps kept in the source's
+media-cache entry (so it is evicted together with the file it describes), named so it never
+matches the cache's "video.*" source lookup. It records the source's quick fingerprint (size plus
+first/last MiB, as the face cache uses): the cache bumps the source's mtime on every access, so
+mtime cannot tell a stale index from a fresh one.
+"""
+import os
+import uuid
+import subprocess
+
+def index_path(source_path: str) -> str:
+    d, name = os.path.split(source_path)
+    return os.path.join(d, f"keyframes-{name}.npz")
+
+def build_index(source_path: str, path: str | None = None):
+    import numpy as np
+    from worker.face_cache import quick_fingerprint
+    out = subprocess.check_output(["ffprobe","-v","error","-select_streams","v:0",
+                                   "-show_entries","packet=pts_time,flags","-of","csv=p=0", source_path], text=True)
+    times = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.append(float(pts))
+    kf = np.unique(np.asarray(times, dtype=np.float64))
+    path = path or index_path(source_path)
+    tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp.npz"
+    np.savez(tmp, kf=kf, fingerprint=np.asarray(quick_fingerprint(source_path)))
+    os.replace(tmp, path)
+    return kf
+
+def load_index(source_path: str, path: str | None = None):
+    """Keyframe times for source_path from path (e.g. Video.keyframes_path) or its default location,
+    rebuilding the index if it is missing or describes different content."""
+    import numpy as np
+    from worker.face_cache import quick_fingerprint
+    path = path if path and os.path.exists(os.path.dirname(path)) else index_path(source_path)
+    try:
+        with np.load(path) as z:
+            if str(z["fingerprint"]) == quick_fingerprint(source_path):
+                return z["kf"]
+    except (OSError, KeyError, ValueError):
+        pass
+    return build_index(source_path, path)
+
+def split_points(kf, start: float, end: float, chunk_sec: float):
+    """Chunk boundaries [start, k1, ..., end] with every interior point on a keyframe, about
+    chunk_sec apart. Chunks never get shorter than half a chunk; with no usable keyframes the
+    range stays whole."""
+    import numpy as np
+    pts = [float(start)]
+    while end - pts[-1] > 1.5 * chunk_sec:
+        lo, hi = pts[-1] + 0.5 * chunk_sec, min(pts[-1] + 1.5 * chunk_sec, end - 0.5 * chunk_sec)
+        cand = kf[(kf >= lo) & (kf <= hi)]
+        if not len(cand):
+            break
+        pts.append(float(cand[np.argmin(np.abs(cand - (pts[-1] + chunk_sec)))]))
+    pts.append(float(end))
+    return pts
+
+def gop_interior(kf, start: float, end: float):
+    """(k1, k2): first keyframe at/after start and last keyframe at/before end, or None if the
+    range holds no complete GOP."""
+    import numpy as np
+    i = int(np.searchsorted(kf, start))
+    j = int(np.searchsorted(kf, end, side="right")) - 1
+    if i >= len(kf) or j < 0 or kf[j] <= kf[i]:
+        return None
+    return float(kf[i]), float(kf[j])
@@ -0,0 +1,143 @@
+"""Content-addressed media cache under MEDIA_ROOT/media.
+
+Each source lives in MEDIA_ROOT/media/<youtube id>/ together with the intermediates derived from
+it, and that directory is the unit of caching: fetch() returns the cached file if present,
+otherwise downloads it once (a Redis lock dedupes concurrent downloads of the same source across
+workers), and every access bumps the entry's mtime. evict() removes least-recently-used entries
+until the directory fits MEDIA_CACHE_BUDGET_GB, skipping sources that still have queued or running
+renders.
+"""
+import os
+import re
+import time
+import uuid
+import shutil
+import hashlib
+
+from redis import Redis
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/data")
+CACHE_ROOT = os.path.join(MEDIA_ROOT, "media")
+BUDGET_BYTES = int(float(os.getenv("MEDIA_CACHE_BUDGET_GB", "50")) * (1 << 30))
+LOCK_TTL = int(os.getenv("MEDIA_LOCK_TTL", "3600"))
+PIN_STALE_HOURS = float(os.getenv("MEDIA_PIN_STALE_HOURS", "24"))  # busy rows untouched this long no longer pin; 0 = never expire
+FORMATS = {"mp4": "video", "audio": "audio"}  # fmt -> file stem inside the entry
+
+_YT_ID = re.compile(r"(?:v=|youtu\.be/|shorts/|embed/)([A-Za-z0-9_-]{11})")
+
+def _redis():
+    return Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+
+def source_id(url: str) -> str:
+    m = _YT_ID.search(url)
+    return m.group(1) if m else hashlib.sha1(url.encode()).hexdigest()[:16]
+
+def entry_dir(url: str) -> str:
+    return os.path.join(CACHE_ROOT, source_id(url))
+
+def touch(path: str) -> None:
+    """Record an access (mtime doubles as last-access time; atime is unreliable on noatime mounts)."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+def _cached(d: str, fmt: str):
+    stem = FORMATS[fmt] + "."
+    try:
+        for f in os.listdir(d):
+            if f.startswith(stem) and not f.endswith((".part", ".tmp")):
+                return os.path.join(d, f)
+    except FileNotFoundError:
+        pass
+    return None
+
+def fetch(url: str, fmt: str = "mp4") -> str:
+    """Path of the cached source for url in the given format, downloading it at most once."""
+    from worker.pipeline import download_video, download_audio
+    d = entry_dir(url)
+    lock = f"media:lock:{source_id(url)}:{fmt}"
+    owner = uuid.uuid4().hex
+    r = _redis()
+    while True:
+        path = _cached(d, fmt)
+        if path:
+            touch(path)
+            return path
+        if r.set(lock, owner, nx=True, ex=LOCK_TTL):
+            break
+        time.sleep(2)  # someone else is downloading this source; wait for their result
+    try:
+        tmp = os.path.join(d, f".dl-{owner}")
+        os.makedirs(tmp, exist_ok=True)
+        got = download_video(url, tmp) if fmt == "mp4" else download_audio(url, tmp)
+        path = os.path.join(d, FORMATS[fmt] + os.path.splitext(got)[1])
+        os.replace(got, path)
+        shutil.rmtree(tmp, ignore_errors=True)
+        touch(path)
+    finally:
+        if r.get(lock) == owner.encode():
+            r.delete(lock)
+    evict()
+    return path
+
+def ensure(url: str, path: str | None, fmt: str = "mp4") -> str:
+    """Return path if it still exists (bumping its access time), else re-fetch the evicted source."""
+    if path and os.path.exists(path):
+        touch(path)
+        return path
+    return fetch(url, fmt)
+
+def _entries():
+    out = []
+    for name in os.listdir(CACHE_ROOT) if os.path.isdir(CACHE_ROOT) else []:
+        d = os.path.join(CACHE_ROOT, name)
+        size, last = 0, 0.0
+        for root, _, files in os.walk(d):
+            for f in files:
+                try:
+                    st = os.stat(os.path.join(root, f))
+                except FileNotFoundError:
+                    continue
+                size += st.st_size
+                last = max(last, st.st_mtime)
+        out.append((last, size, d))
+    return out
+
+def pinned_dirs() -> set:
+    """Entries still needed: sources of videos with queued/running renders or in-flight stages.
+
+    A clip or video whose busy status has not changed for MEDIA_PIN_STALE_HOURS is taken to be a
+    job that died without recording failure, and stops pinning its source."""
+    from datetime import datetime, timedelta
+    from sqlalchemy import func, true
+    from shared.db import SessionLocal
+    from api.models import Video, Clip
+    def fresh(model):
+        if PIN_STALE_HOURS <= 0:
+            return true()
+        return func.coalesce(model.updated_at, model.created_at) >= datetime.utcnow() - timedelta(hours=PIN_STALE_HOURS)
+    with SessionLocal() as db:
+        busy = {v for (v,) in db.query(Clip.video_id).filter(
+            Clip.status.in_(("queued", "previewing", "rendering")), fresh(Clip)).distinct()}
+        rows = db.query(Video.source_path, Video.audio_path).filter(
+            Video.id.in_(busy) | (Video.status.in_(("downloading", "audio_ready", "downloaded", "transcribing")) & fresh(Video))).all()
+    return {os.path.dirname(p) for row in rows for p in row if p}
+
+def evict(budget: int | None = None) -> list:
+    budget = BUDGET_BYTES if budget is None else budget
+    entries = _entries()
+    total = sum(size for _, size, _ in entries)
+    if total <= budget:
+        return []
+    pinned = pinned_dirs()
+    removed = []
+    for last, size, d in sorted(entries):
+        if total <= budget:
+            break
+        if d in pinned or any(f.startswith(".dl-") for f in os.listdir(d)):
+            continue
+        shutil.rmtree(d, ignore_errors=True)
+        total -= size
+        removed.append(d)
+    return removed
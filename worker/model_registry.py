@@ -0,0 +1,65 @@
+"""Process-wide registry of ML models.
+
+Nothing is loaded at import time: models are created on first use and cached per
+(kind, name, device, compute_type), so the API process only pays for what it touches while
+worker pools call preload() from their initializer to stay warm. report() lists what this
+process has loaded and how long each load took.
+"""
+import os
+import time
+import resource
+import threading
+
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "small")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "default")
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", "4"))
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE") or None  # None: Whisper detects the language
+EMB_MODEL_NAME = os.getenv("EMB_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+DEVICE = os.getenv("DEVICE", "cpu")
+MODEL_CACHE = os.getenv("MODEL_CACHE") or None
+
+_models = {}
+_load_sec = {}
+_lock = threading.Lock()
+
+def _get(key, factory):
+    m = _models.get(key)
+    if m is None:
+        with _lock:
+            m = _models.get(key)
+            if m is None:
+                t0 = time.perf_counter()
+                m = factory()
+                _load_sec[key] = time.perf_counter() - t0
+                _models[key] = m
+    return m
+
+def get_whisper(name=None, device=None, compute_type=None):
+    name, device, compute_type = name or WHISPER_MODEL_NAME, device or DEVICE, compute_type or WHISPER_COMPUTE_TYPE
+    def factory():
+        from faster_whisper import WhisperModel
+        return WhisperModel(name, device=device, compute_type=compute_type, cpu_threads=WHISPER_THREADS, download_root=MODEL_CACHE)
+    return _get(("whisper", name, device, compute_type), factory)
+
+def get_embedder(name=None, device=None):
+    name, device = name or EMB_MODEL_NAME, device or DEVICE
+    def factory():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(name, device=device, cache_folder=MODEL_CACHE)
+    return _get(("embedder", name, device, None), factory)
+
+LOADERS = {"whisper": get_whisper, "embedder": get_embedder}
+
+def preload(*kinds):
+    """Load the default model of each kind now (worker pool initializers call this)."""
+    for k in kinds:
+        LOADERS[k]()
+    return report()
+
+def report():
+    """Loaded models with load times, plus this process's peak RSS."""
+    return {
+        "models": [{"kind": k[0], "name": k[1], "device": k[2], "compute_type": k[3], "load_sec": round(_load_sec[k], 3)}
+                   for k in list(_models)],
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
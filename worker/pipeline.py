@@ -1,11 +1,22 @@
 import os, subprocess
-from faster_whisper import WhisperModel
-from sentence_transformers import SentenceTransformer
-
-WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "small")
-DEVICE = os.getenv("DEVICE", "cpu")
-WHISPER_MODEL = WhisperModel(WHISPER_MODEL_NAME, device=DEVICE)
-EMB_MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+from worker.model_registry import get_whisper, get_embedder, DEVICE, WHISPER_LANGUAGE
+from worker.wordstore import WordStore
+
+EMB_BATCH_SIZE = int(os.getenv("EMB_BATCH_SIZE", "64"))
+EMB_POOL_PROCESSES = int(os.getenv("EMB_POOL_PROCESSES", "0"))  # >1: multi-process encode pool (CPU only)
+_EMB_POOL = None
+WINDOW_LENS = [float(x) for x in os.getenv("WINDOW_LENS", "30").split(",") if x.strip()]  # e.g. "15,30,60"
+WINDOW_STRIDE_FRAC = float(os.getenv("WINDOW_STRIDE_FRAC", "0.3333"))  # stride = len * frac (30s -> 10s)
+PREVIEW_HEIGHT = int(os.getenv("PREVIEW_HEIGHT", "640"))
+# encoder settings per render tier; previews are for approval UIs only
+VIDEO_ENC = {
+    "full": ["-r","30","-c:v","libx264","-preset","veryfast","-crf","18"],
+    "preview": ["-r","30","-c:v","libx264","-preset","ultrafast","-crf","30"],
+}
+AUDIO_ENC = {"full": ["-c:a","aac","-b:a","160k"], "preview": ["-c:a","aac","-b:a","96k"]}
+ENCODE = {q: VIDEO_ENC[q] + AUDIO_ENC[q] for q in VIDEO_ENC}
+RENDER_BATCH_MAX_GAP = float(os.getenv("RENDER_BATCH_MAX_GAP", "60"))  # seconds of unused source a batch may decode through
+RENDER_BATCH_MAX_OUTPUTS = int(os.getenv("RENDER_BATCH_MAX_OUTPUTS", "0")) or max(2, (os.cpu_count() or 1) // 2)
 
 def download_video(youtube_url: str, out_dir: str) -> str:
     os.makedirs(out_dir, exist_ok=True)
@@ -13,12 +24,39 @@ def download_video(youtube_url: str, out_dir: str) -> str:
     cmd = ["yt-dlp","-f","mp4","-o", out, youtube_url]
     subprocess.check_call(cmd)
     for f in os.listdir(out_dir):
-        if f.endswith(".mp4"):
+        if f.endswith(".mp4") and ".audio." not in f:
             return os.path.join(out_dir, f)
     raise RuntimeError("mp4 not found")
 
-def transcribe(path: str):
-    segments, info = WHISPER_MODEL.transcribe(path, word_timestamps=True)
+def download_audio(youtube_url: str, out_dir: str) -> str:
+    """Fetch only the best audio stream (a fraction of the mp4 size) so ASR can start early."""
+    os.makedirs(out_dir, exist_ok=True)
+    out = os.path.join(out_dir, "%(id)s.audio.%(ext)s")
+    subprocess.check_call(["yt-dlp","-f","bestaudio","-o", out, youtube_url])
+    for f in os.listdir(out_dir):
+        if ".audio." in f and not f.endswith(".part"):
+            return os.path.join(out_dir, f)
+    raise RuntimeError("audio not found")
+
+TRANSCRIBE_MODE = os.getenv("TRANSCRIBE_MODE", "single")  # single | chunked (VAD split + process pool)
+
+def transcribe(path: str, use_cache: bool = True):
+    from worker import transcript_cache
+    key = transcript_cache.cache_key(path) if use_cache else None
+    res = transcript_cache.get(key) if key else None
+    if res is not None:
+        return res
+    if TRANSCRIBE_MODE == "chunked":
+        from worker.chunked_asr import transcribe_chunked
+        res = transcribe_chunked(path)
+    else:
+        res = transcribe_single(path)
+    if key:
+        transcript_cache.put(key, res)
+    return res
+
+def transcribe_single(path: str):
+    segments, info = get_whisper().transcribe(path, word_timestamps=True, language=WHISPER_LANGUAGE)
     words, full = [], []
     for seg in segments:
         full.append(seg.text.strip())
@@ -27,75 +65,227 @@ def transcribe(path: str):
                 words.append({"w": w.word, "start": float(w.start), "end": float(w.end)})
     return {"text": " ".join(full), "words": words, "lang": info.language}
 
+def window_bounds(words, target_len=30.0, stride=10.0):
+    """Word index ranges [i, j) and times (t0, t1) of every sliding window, in linear time.
+
+    Same windows as the original two-loop scan: a window starts at word i and takes words while
+    end - start[i] < target_len; the next window starts at the first word with start >= t0 + stride.
+    """
+    import numpy as np
+    s, e, _ = WordStore.coerce(words).columns()
+    n = len(s)
+    if n == 0:
+        z = np.zeros(0)
+        return z.astype(np.int64), z.astype(np.int64), z, z
+    nxt = np.maximum(np.searchsorted(s, s + stride, side="left"), np.arange(1, n + 1))
+    j_all = np.maximum(np.searchsorted(np.maximum.accumulate(e), s + target_len, side="left"), np.arange(n))
+    starts, i = [], 0
+    while i < n:  # one step per window
+        starts.append(i)
+        i = int(nxt[i])
+    i = np.asarray(starts, dtype=np.int64)
+    j = j_all[i]
+    t0 = s[i]
+    t1 = np.where(j > i, e[np.maximum(j - 1, 0)], t0 + target_len)
+    return i, j, t0, t1
+
+def window_table(words, lens=None, stride=None):
+    """Boundaries and text features for all windows of every length in lens (one sweep per length).
+
+    Features come from prefix sums over per-token stats, so each window costs O(1) after one pass:
+    exclam ("!" and "wow" counts), avg_word / word_std (token length stats), quoteability.
+    Returns a dict of equally long NumPy arrays.
+    """
+    import numpy as np
+    ws = WordStore.coerce(words)
+    _, _, ids = ws.columns()
+    vocab_len = np.fromiter((len(t) for t in ws.vocab), dtype=np.float64, count=len(ws.vocab))
+    vocab_ex = np.fromiter((t.count("!") + t.lower().count("wow") for t in ws.vocab), dtype=np.float64, count=len(ws.vocab))
+    zero = np.zeros(1)
+    c_len = np.concatenate([zero, np.cumsum(vocab_len[ids])])
+    c_len2 = np.concatenate([zero, np.cumsum(vocab_len[ids] ** 2)])
+    c_ex = np.concatenate([zero, np.cumsum(vocab_ex[ids])])
+    parts = []
+    for L in (lens or WINDOW_LENS):
+        i, j, t0, t1 = window_bounds(ws, L, stride or L * WINDOW_STRIDE_FRAC)
+        parts.append((i, j, t0, t1, np.full(len(i), float(L))))
+    i, j, t0, t1, wl = (np.concatenate(c) for c in zip(*parts))
+    cnt = (j - i).astype(np.float64)
+    safe = np.maximum(cnt, 1.0)
+    tot = c_len[j] - c_len[i]
+    avg = np.where(cnt > 0, tot / safe, 5.0)
+    var = np.where(cnt > 0, (c_len2[j] - c_len2[i]) / safe - avg ** 2, 0.0)
+    return {
+        "i": i, "j": j, "start": t0, "end": t1, "window": wl, "n_words": cnt,
+        "exclam": c_ex[j] - c_ex[i], "avg_word": avg, "word_std": np.sqrt(np.maximum(var, 0.0)),
+        "quoteability": 1.0 / np.maximum(1.0, avg),
+    }
+
+SCORE_WEIGHTS = {"quoteability": 0.6, "exclam": 0.4}  # visual/audio default to VISUAL_WEIGHT / AUDIO_WEIGHT
+
+def score_weights(weights=None):
+    """Default scorer weights overlaid with weights (e.g. ChannelSub.score_weights or a RERANK job's)."""
+    from worker.visual import VISUAL_WEIGHT
+    from worker.audio import AUDIO_WEIGHT
+    return {**SCORE_WEIGHTS, "visual": VISUAL_WEIGHT, "audio": AUDIO_WEIGHT,
+            **{k: float(v) for k, v in (weights or {}).items() if v is not None}}
+
+def score_windows(tab, weights=None):
+    import numpy as np
+    w = score_weights(weights)
+    score = w["quoteability"] * tab["quoteability"] + np.where(tab["exclam"] > 0, w["exclam"], 0.0)
+    if "motion" in tab:  # visual signals from worker/visual.py, when the video has been analyzed
+        mot = tab["motion"] / max(float(tab["motion"].max()), 1e-6) if len(tab["motion"]) else tab["motion"]
+        score = score + w["visual"] * (0.5 * mot + 0.5 * tab["face_ratio"])
+    if "audio_rms" in tab:  # audio signals from worker/audio.py
+        score = score + w["audio"] * (0.4 * _unit(tab["audio_rms"]) + 0.3 * _unit(tab["audio_pitch_var"])
+                                      + 0.3 * np.minimum(1.0, 4.0 * tab["audio_burst"]))
+    return score
+
+def _unit(x):
+    """Min-max scale to [0, 1] across the candidate windows."""
+    import numpy as np
+    if not len(x):
+        return x
+    lo, hi = float(x.min()), float(x.max())
+    return (x - lo) / (hi - lo) if hi > lo else np.zeros_like(x)
+
 def sliding_windows(words, target_len=30.0, stride=10.0):
-    i, n = 0, len(words)
-    while i < n:
-        t0 = words[i]["start"]
-        j = i
-        while j < n and words[j]["end"] - t0 < target_len:
-            j += 1
-        t1 = words[j-1]["end"] if j > i else t0 + target_len
-        yield t0, t1, words[i:j]
-        while i < n and words[i]["start"] < t0 + stride:
-            i += 1
-
-def text_features(tokens):
-    txt = "".join([w["w"] for w in tokens]).strip()
-    exclam = txt.count("!") + txt.lower().count("wow")
-    avg_word = (sum(len(w["w"]) for w in tokens)/len(tokens)) if tokens else 5.0
-    quoteability = 1.0 / max(1.0, avg_word)
-    emb = EMB_MODEL.encode([txt], normalize_embeddings=True)[0].tolist()
-    return {"exclam": int(exclam), "quoteability": float(quoteability)}, emb
-
-def overlap(a, b, iou_thr=0.3):
-    inter = max(0.0, min(a["end"], b["end"]) - max(a["start"], b["start"]))
-    union = (a["end"]-a["start"]) + (b["end"]-b["start"]) - inter
-    return (inter/union) > iou_thr
-
-def rank_segments(words):
-    rows = []
-    for t0, t1, toks in sliding_windows(words):
-        f, emb = text_features(toks)
-        score = 0.6*f["quoteability"] + (0.4 if f["exclam"]>0 else 0.0)
-        rows.append({"start": t0, "end": t1, "score": float(score), "features": f, "embedding": emb})
-    rows.sort(key=lambda r: r["score"], reverse=True)
-    keep, used = [], []
-    for r in rows:
-        if all(not overlap(r, u) for u in used):
-            keep.append(r); used.append(r)
-        if len(keep) >= 12: break
+    ws = WordStore.coerce(words)
+    for i, j, t0, t1 in zip(*window_bounds(ws, target_len, stride)):
+        yield float(t0), float(t1), ws[int(i):int(j)]
+
+def window_text(tokens):
+    return WordStore.coerce(tokens).text()
+
+def _emb_pool():
+    global _EMB_POOL
+    if _EMB_POOL is None:
+        _EMB_POOL = get_embedder().start_multi_process_pool(["cpu"] * EMB_POOL_PROCESSES)
+    return _EMB_POOL
+
+def embed_texts(texts, batch_size=None):
+    """Encode all texts in batched forward passes; returns an (n, dim) float32 array of unit vectors."""
+    import numpy as np
+    bs = batch_size or EMB_BATCH_SIZE
+    model = get_embedder()
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if EMB_POOL_PROCESSES > 1 and DEVICE == "cpu" and len(texts) > bs * EMB_POOL_PROCESSES:
+        emb = np.asarray(model.encode_multi_process(texts, _emb_pool(), batch_size=bs), dtype=np.float32)
+        return emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+    # sort by length so each batch pads to similar sizes, then restore order
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    emb = model.encode([texts[i] for i in order], batch_size=bs, normalize_embeddings=True, convert_to_numpy=True)
+    out = np.empty_like(emb, dtype=np.float32)
+    out[order] = emb
+    return out
+
+def iou(a0, a1, b0, b1):
+    inter = max(0.0, min(a1, b1) - max(a0, b0))
+    union = (a1-a0) + (b1-b0) - inter
+    return inter/union if union > 0 else 0.0
+
+def select_segments(starts, ends, scores, top_k=12, iou_thr=0.3):
+    """Greedy non-maximum suppression by score using a sweep-line interval index.
+
+    Kept intervals live in a start-sorted list; a candidate [s,e] can only overlap kept intervals
+    whose start lies in (s - longest_kept, e), so each check bisects to that slice instead of
+    scanning everything kept. Returns [(candidate_index, reason)] for kept windows; reason records
+    the rank and how many lower-scored candidates each kept window suppressed.
+    """
+    from bisect import bisect_left, bisect_right
+    order = sorted(range(len(scores)), key=lambda k: -scores[k])
+    idx_starts, idx_pos = [], []  # kept starts (sorted) and the matching position in keep
+    keep, longest = [], 0.0
+    for k in order:
+        s, e = float(starts[k]), float(ends[k])
+        hit = None
+        for p in range(bisect_right(idx_starts, s - longest), bisect_left(idx_starts, e)):
+            kk = keep[idx_pos[p]][0]
+            if iou(s, e, float(starts[kk]), float(ends[kk])) > iou_thr:
+                hit = idx_pos[p]
+                break
+        if hit is not None:
+            keep[hit][1]["suppressed"] += 1
+            continue
+        if len(keep) >= top_k:
+            break
+        keep.append((k, {"rank": len(keep), "suppressed": 0, "iou_thr": iou_thr}))
+        p = bisect_right(idx_starts, s)
+        idx_starts.insert(p, s)
+        idx_pos.insert(p, len(keep) - 1)
+        longest = max(longest, e - s)
     return keep
 
+FEATURE_KEYS = ("exclam", "quoteability", "avg_word", "word_std", "n_words", "window")
+VISUAL_KEYS = ("motion", "cuts", "face_ratio")
+AUDIO_KEYS = ("audio_rms", "audio_pitch_var", "audio_onsets", "audio_burst")
+
+def attach_signals(tab, visual=None, audio=None):
+    """Add per-window visual (worker.visual.load) and audio (worker.audio.load) features to tab, in place."""
+    if visual is not None:
+        from worker.visual import window_features
+        tab.update(window_features(visual, tab["start"], tab["end"]))
+    if audio is not None:
+        from worker.audio import window_features as audio_features
+        tab.update(audio_features(audio, tab["start"], tab["end"]))
+    return tab
+
+def rank_table(words, lens=None, visual=None, audio=None):
+    """(tab, embs): every candidate window with its features, and one embedding per window."""
+    ws = WordStore.coerce(words)
+    tab = attach_signals(window_table(ws, lens), visual, audio)
+    embs = embed_texts([ws[int(i):int(j)].text() for i, j in zip(tab["i"], tab["j"])])
+    return tab, embs
+
+def pick_windows(tab, embs, scores, top_k=12, iou_thr=0.3):
+    """Segment rows for the windows NMS keeps, with the feature columns present in tab."""
+    keys = FEATURE_KEYS + (VISUAL_KEYS if "motion" in tab else ()) + (AUDIO_KEYS if "audio_rms" in tab else ())
+    keep = []
+    for k, reason in select_segments(tab["start"], tab["end"], scores, top_k, iou_thr):
+        keep.append({"start": float(tab["start"][k]), "end": float(tab["end"][k]), "score": float(scores[k]),
+                     "features": {f: (int(tab[f][k]) if f in ("exclam", "n_words") else float(tab[f][k])) for f in keys},
+                     "embedding": embs[k].tolist(), "reason": {**reason, "window": float(tab["window"][k])}})
+    return keep
 
-def to_srt(words, out_path, max_gap=0.6):
+def rank_segments(words, lens=None, top_k=12, iou_thr=0.3, visual=None, audio=None, weights=None):
+    """Top windows after NMS. visual: arrays from worker.visual.load, adding motion/cuts/face features;
+    audio: per-second series from worker.audio.load, adding energy/pitch/burst features."""
+    tab, embs = rank_table(words, lens, visual, audio)
+    return pick_windows(tab, embs, score_windows(tab, weights), top_k, iou_thr)
+
+def caption_chunks(words, max_gap=0.6, start=None, end=None):
+    """Group words into caption lines split at gaps > max_gap. With start/end, only that range is
+    read (bisect slice of the word store) and times are made relative to start."""
+    ws = WordStore.coerce(words)
+    off = 0.0
+    if start is not None:
+        ws, off = ws.range(start, float("inf") if end is None else end), start
+    chunks, a, n = [], 0, len(ws)
+    for i in range(n):
+        if i+1 == n or (ws.start(i+1) - ws.end(i)) > max_gap:
+            chunks.append((ws.start(a) - off, ws.end(i) - off, "".join(ws[a:i+1].tokens()).strip()))
+            a = i + 1
+    return chunks
+
+def to_srt(words, out_path, max_gap=0.6, start=None, end=None):
     def ts(x):
         h=int(x//3600); m=int((x%3600)//60); s=x%60
         return f"{h:02}:{m:02}:{s:06.3f}".replace('.',',')
-    chunks, cur = [], []
-    for i,w in enumerate(words):
-        cur.append(w)
-        if i+1==len(words) or (words[i+1]["start"]-w["end"])>max_gap:
-            chunks.append((cur[0]["start"], cur[-1]["end"], "".join([t["w"] for t in cur]).strip()))
-            cur=[]
+    chunks = caption_chunks(words, max_gap, start, end)
     with open(out_path,"w",encoding="utf-8") as f:
         for i,(s,e,txt) in enumerate(chunks,1):
             f.write(f"{i}\n{ts(s)} --> {ts(e)}\n{txt}\n\n")
 
-def to_ass(words, out_path, keywords=None, max_gap=0.6, font="Inter", font_size=48, primary_color="&H00FFFFFF", emphasis_color="&H0000FF00"):
+def to_ass(words, out_path, keywords=None, max_gap=0.6, font="Inter", font_size=48, primary_color="&H00FFFFFF", emphasis_color="&H0000FF00", start=None, end=None):
     """Build a minimal ASS file. keywords (list[str]) will be bold+colored when matched case-insensitively.
-    Colors use ASS BGR hex (&H00BBGGRR)."""
+    Colors use ASS BGR hex (&H00BBGGRR). start/end select a clip range and make times clip-relative."""
     import re
     def ts(x):
         h=int(x//3600); m=int((x%3600)//60); s=x%60
         return f"{h:01d}:{m:02d}:{s:05.2f}"
-    # group into chunks
-    chunks, cur = [], []
-    for i,w in enumerate(words):
-        cur.append(w)
-        if i+1==len(words) or (words[i+1]["start"]-w["end"])>max_gap:
-            txt = "".join([t["w"] for t in cur]).strip()
-            chunks.append((cur[0]["start"], cur[-1]["end"], txt))
-            cur=[]
+    chunks = caption_chunks(words, max_gap, start, end)
     kw = [k.strip() for k in (keywords or []) if k.strip()]
     def emph(txt):
         if not kw: return txt
@@ -124,35 +314,33 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             line = emph(txt).replace("\n"," ")
             f.write(f"Dialogue: 0,{ts(s)},{ts(e)},Default,,0,0,0,,{line}\n")
 
-def compute_face_crop(input_path: str, start: float, end: float, target_h: int = 1920, crop_w: int = 1080, sample_fps: float = 2.0):
-    """Sample frames in [start,end], detect faces with Haar, and return (scaled_width, x_offset) for 9:16 crop."""
+def _face_cascade():
     import cv2
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
+    return cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+def _min_face(src):
+    # the original detector used 60px on 1080p frames; keep that size relative to the frame height
+    # (analysis frames may come from the low-res proxy, so the source's own scale is not a reference)
+    m = max(12, int(round(60 * src.height / 1080.0)))
+    return (m, m)
+
+def compute_face_crop(input_path: str, start: float, end: float, target_h: int = 1920, crop_w: int = 1080, sample_fps: float = 2.0):
+    """Sample frames in [start,end], detect faces with Haar, and return (scaled_width, x_offset) for 9:16 crop.
+    Frames come from one sequential low-res decode (worker/frames.py) rather than a seek per sample."""
+    from worker.frames import FrameSource
+    try:
+        src = FrameSource(input_path, start, end, fps=sample_fps, pix_fmt="gray")
+    except Exception:
         return None
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    orig_w = cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 1920
-    orig_h = cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 1080
-    scale = target_h / float(orig_h)
-    scaled_w = orig_w * scale
-    cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-    face_cascade = cv2.CascadeClassifier(cascade_path)
+    scaled_w = src.orig_w * target_h / float(src.orig_h)
+    to_target = target_h / float(src.height)  # analysis px -> scaled (target_h) px
+    face_cascade = _face_cascade()
     xs = []
-    total_frames = int(max(1, (end - start) * sample_fps))
-    for i in range(total_frames):
-        t = start + i / sample_fps
-        frame_idx = int(t * fps)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        ok, frame = cap.read()
-        if not ok or frame is None:
-            continue
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(60,60))
+    for _, gray in src:
+        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=_min_face(src))
         if len(faces) > 0:
             x,y,w,h = max(faces, key=lambda f: f[2]*f[3])
-            center_x = (x + w/2.0) * scale
-            xs.append(center_x)
-    cap.release()
+            xs.append((x + w/2.0) * to_target)
     if not xs:
         return int(scaled_w), int(max(0, (scaled_w - crop_w)/2))
     xs.sort()
@@ -161,8 +349,34 @@ def compute_face_crop(input_path: str, start: float, end: float, target_h: int =
     x0 = max(0, min(int(scaled_w - crop_w), x0))
     return int(round(scaled_w)), x0
 
-def render_clip(input_path, start, end, out_path, aspect="9:16", srt_path=None, crop_hint=None):
-    vf = 'scale=-2:1920,crop=1080:1920'
+def thin_track(track, min_dx=6):
+    """Keyframes of a crop track: first/last point plus every point that moved >= min_dx px."""
+    if len(track) < 3:
+        return list(track)
+    keep = [track[0]]
+    for t, x in track[1:-1]:
+        if abs(x - keep[-1][1]) >= min_dx:
+            keep.append((t, x))
+    keep.append(track[-1])
+    return keep
+
+def write_crop_cmds(track, path, target="crop@reframe"):
+    """sendcmd script that moves the crop's x linearly between consecutive keyframes.
+    The crop filter re-evaluates x every frame, so each interval sets an expression in t."""
+    lines = []
+    for (ta, xa), (tb, xb) in zip(track, track[1:]):
+        slope = (xb - xa) / (tb - ta) if tb > ta else 0.0
+        lines.append(f"{ta:.3f} {target} x {xa}+(t-{ta:.3f})*({slope:.4f});")
+    if track:
+        lines.append(f"{track[-1][0]:.3f} {target} x {track[-1][1]};")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+def clip_filters(out_path, aspect="9:16", srt_path=None, crop_hint=None, crop_track=None, name="reframe", quality="full"):
+    """Video filter chain for one output -> (vf, sendcmd script path or None).
+    quality="preview" downscales the finished frame to PREVIEW_HEIGHT so crop/caption geometry matches the full render."""
+    vf, cmds = 'scale=-2:1920,crop=1080:1920', None
     if aspect == "1:1":
         vf = 'scale=1080:-2,crop=1080:1080'
     if aspect == "16:9":
@@ -170,29 +384,187 @@ def render_clip(input_path, start, end, out_path, aspect="9:16", srt_path=None,
     if crop_hint and aspect == "9:16":
         scaled_w, x0 = crop_hint
         vf = f'scale={int(round(scaled_w))}:1920,crop=1080:1920:{x0}:0'
+    if crop_track and crop_track[1] and aspect == "9:16":
+        scaled_w, keys = crop_track[0], thin_track(crop_track[1])
+        cmds = write_crop_cmds(keys, out_path + ".cmd", target=f"crop@{name}")
+        vf = f"sendcmd=f='{cmds}',scale={int(round(scaled_w))}:1920,crop@{name}=1080:1920:{keys[0][1]}:0"
     if srt_path:
         vf = vf + f",subtitles='{srt_path}'"
-    cmd = ["ffmpeg","-y","-ss",f"{start}","-to",f"{end}","-i", input_path,"-vf", vf,"-r","30","-c:v","libx264","-preset","veryfast","-crf","18","-c:a","aac","-b:a","160k", out_path]
-    import subprocess
-    subprocess.check_call(cmd)
+    if quality == "preview":
+        vf = vf + f",scale=-2:{PREVIEW_HEIGHT}"
+    return vf, cmds
+
+def render_clip(input_path, start, end, out_path, aspect="9:16", srt_path=None, crop_hint=None, broll=None, crop_track=None, quality="full"):
+    """Render [start,end] of input_path. broll is an optional list of (path, t0, t1) PiP overlays,
+    with t0/t1 relative to the clip start; the original audio is kept.
+    crop_track = (scaled_w, [(t_rel, x0), ...]) from compute_face_track gives a moving 9:16 crop in the
+    same single ffmpeg pass: keyframes drive the crop's x through sendcmd, interpolated per frame.
+    quality selects the ENCODE tier ("full" or the low-res "preview")."""
+    vf, cmds = clip_filters(out_path, aspect, srt_path, crop_hint, crop_track, quality=quality)
+    cmd = ["ffmpeg","-y","-ss",f"{start}","-to",f"{end}","-i", input_path]
+    if broll:
+        graph, last = [f"[0:v]{vf}[v0]"], "v0"
+        for k, (path, t0, t1) in enumerate(broll, 1):
+            cmd += ["-t", f"{t1 - t0}", "-i", path]
+            graph.append(f"[{k}:v]scale=360:-2,setpts=PTS-STARTPTS+{t0}/TB[b{k}]")
+            graph.append(f"[{last}][b{k}]overlay=W-w-40:H*0.12:enable='between(t,{t0},{t1})':eof_action=pass[v{k}]")
+            last = f"v{k}"
+        cmd += ["-filter_complex", ";".join(graph), "-map", f"[{last}]", "-map", "0:a?"]
+    else:
+        cmd += ["-vf", vf]
+    cmd += ENCODE[quality] + [out_path]
+    try:
+        subprocess.check_call(cmd)
+    finally:
+        if cmds:
+            os.remove(cmds)
     return out_path
 
+def render_chunk(input_path, a, b, offset, out_path, aspect="9:16", srt_path=None, crop_hint=None, crop_track=None, quality="full"):
+    """Video-only render of source [a, b) that sits `offset` seconds into its clip.
+
+    Timestamps are shifted by offset before the clip filters, so captions and crop keyframes (both
+    relative to the clip start) line up, then reset so each chunk starts at 0 for concat_chunks.
+    """
+    vf, cmds = clip_filters(out_path, aspect, srt_path, crop_hint, crop_track, quality=quality)
+    vf = f"setpts=PTS-STARTPTS+{offset:.3f}/TB,{vf},setpts=PTS-STARTPTS"
+    cmd = ["ffmpeg","-y","-ss",f"{a}","-to",f"{b}","-i", input_path, "-an", "-vf", vf] + VIDEO_ENC[quality] + [out_path]
+    try:
+        subprocess.check_call(cmd)
+    finally:
+        if cmds:
+            os.remove(cmds)
+    return out_path
+
+def concat_chunks(parts, input_path, start, end, out_path, quality="full"):
+    """Join chunk renders without re-encoding video (concat demuxer, -c:v copy) and encode the
+    clip's audio from the source in the same pass, so chunk seams carry no AAC priming gaps."""
+    lst = out_path + ".concat.txt"
+    with open(lst, "w") as f:
+        f.writelines(f"file '{p}'\n" for p in parts)
+    cmd = ["ffmpeg","-y","-f","concat","-safe","0","-i", lst, "-ss",f"{start}","-to",f"{end}","-i", input_path,
+           "-map","0:v","-map","1:a?","-c:v","copy"] + AUDIO_ENC[quality] + ["-shortest", out_path]
+    try:
+        subprocess.check_call(cmd)
+    finally:
+        os.remove(lst)
+    return out_path
+
+def smart_cut_ok(input_path, aspect="9:16", srt_path=None, crop_hint=None, crop_track=None, broll=None, quality="full"):
+    """A render is a plain cut of the source (no captions, crop, overlays or rescale) that can be
+    stream-copied: full tier, 16:9 from an H.264 1920px-wide yuv420p source."""
+    if quality != "full" or aspect != "16:9" or srt_path or crop_hint or crop_track or broll:
+        return False
+    from worker.frames import probe
+    try:
+        info = probe(input_path)
+    except Exception:
+        return False
+    return info["codec"] == "h264" and info["width"] == 1920 and info["pix_fmt"] == "yuv420p"
+
+def smart_cut(input_path, start, end, out_path, kf):
+    """Frame-accurate cut that only re-encodes the partial GOPs at either end.
+
+    [start, k1) and [k2, end) are encoded with libx264 at the source's size and rate; the interior
+    [k1, k2) between keyframes is stream-copied. Parts are MPEG-TS (in-band SPS/PPS) so the
+    concat demuxer can join differently encoded H.264 segments; audio is encoded from the source
+    in the joining pass (concat_chunks). Falls back to render_clip if no full GOP fits.
+    """
+    from worker.keyframes import gop_interior
+    span = gop_interior(kf, start, end)
+    if span is None:
+        return render_clip(input_path, start, end, out_path, aspect="16:9")
+    k1, k2 = span
+    enc = ["-an","-c:v","libx264","-preset","veryfast","-crf","18","-pix_fmt","yuv420p","-bsf:v","h264_mp4toannexb","-f","mpegts"]
+    parts = []
+    if k1 - start > 1e-3:
+        parts.append(out_path + ".head.ts")
+        subprocess.check_call(["ffmpeg","-y","-ss",f"{start}","-to",f"{k1}","-i", input_path] + enc + [parts[-1]])
+    parts.append(out_path + ".mid.ts")
+    subprocess.check_call(["ffmpeg","-y","-ss",f"{k1}","-i", input_path,"-t",f"{k2 - k1}","-an","-c:v","copy",
+                           "-bsf:v","h264_mp4toannexb","-f","mpegts", parts[-1]])
+    if end - k2 > 1e-3:
+        parts.append(out_path + ".tail.ts")
+        subprocess.check_call(["ffmpeg","-y","-ss",f"{k2}","-to",f"{end}","-i", input_path] + enc + [parts[-1]])
+    try:
+        return concat_chunks(parts, input_path, start, end, out_path)
+    finally:
+        for p in parts:
+            os.remove(p)
+
+def _has_audio(path):
+    out = subprocess.check_output(["ffprobe","-v","error","-select_streams","a","-show_entries","stream=index","-of","csv=p=0", path])
+    return bool(out.strip())
+
+def plan_batches(items, max_gap=None, max_outputs=None):
+    """Group render items (dicts with start/end) into shared-decode batches, in time order.
+
+    A clip joins the current group while the undecoded gap before it is at most max_gap seconds
+    (decoding a gap costs about as much as decoding it again for a separate render) and the group
+    has fewer than max_outputs clips; x264 encoders in one process share the CPU.
+    """
+    max_gap = RENDER_BATCH_MAX_GAP if max_gap is None else max_gap
+    max_outputs = max_outputs or RENDER_BATCH_MAX_OUTPUTS
+    groups, hi = [], None
+    for it in sorted(items, key=lambda r: r["start"]):
+        if groups and it["start"] - hi <= max_gap and len(groups[-1]) < max_outputs:
+            groups[-1].append(it)
+            hi = max(hi, it["end"])
+        else:
+            groups.append([it])
+            hi = it["end"]
+    return groups
+
+def render_batch(input_path, items, quality="full"):
+    """Render several clips of input_path from one decode of their combined span.
+
+    items are dicts with start, end, out, aspect, srt_path, crop_hint, crop_track (render_clip's
+    arguments). One ffmpeg seeks to the earliest start, splits the decoded stream, and each branch
+    trims its own range, resets timestamps and applies its crop/captions before its own encoder.
+    Encoder threads are divided between outputs so one batch does not oversubscribe the CPU.
+    """
+    lo, hi = min(r["start"] for r in items), max(r["end"] for r in items)
+    n = len(items)
+    audio = _has_audio(input_path)
+    graph = [f"[0:v]split={n}" + "".join(f"[s{k}]" for k in range(n))]
+    if audio:
+        graph.append(f"[0:a]asplit={n}" + "".join(f"[as{k}]" for k in range(n)))
+    threads = max(1, (os.cpu_count() or 1) // n)
+    outs, scripts = [], []
+    for k, r in enumerate(items):
+        vf, cmds = clip_filters(r["out"], r["aspect"], r.get("srt_path"), r.get("crop_hint"), r.get("crop_track"), name=f"reframe{k}", quality=quality)
+        scripts.append(cmds)
+        a, b = r["start"] - lo, r["end"] - lo
+        graph.append(f"[s{k}]trim=start={a:.3f}:end={b:.3f},setpts=PTS-STARTPTS,{vf}[v{k}]")
+        outs += ["-map", f"[v{k}]"]
+        if audio:
+            graph.append(f"[as{k}]atrim=start={a:.3f}:end={b:.3f},asetpts=PTS-STARTPTS[a{k}]")
+            outs += ["-map", f"[a{k}]"]
+        outs += ENCODE[quality] + ["-threads", str(threads), r["out"]]
+    cmd = ["ffmpeg","-y","-ss",f"{lo}","-to",f"{hi}","-i", input_path, "-filter_complex", ";".join(graph)] + outs
+    try:
+        subprocess.check_call(cmd)
+    finally:
+        for p in scripts:
+            if p:
+                os.remove(p)
+    return [r["out"] for r in items]
+
 
 def compute_face_track(input_path: str, start: float, end: float, target_h: int = 1920, crop_w: int = 1080, sample_fps: float = 10.0):
     """Lightweight face tracker: detect faces periodically, track between detections (CSRT/KCF/MOSSE).
-    Returns (scaled_w, [(t_relative_sec, x0_int), ...]) where x0 is the left crop offset in the scaled domain."""
+    Returns (scaled_w, [(t_relative_sec, x0_int), ...]) where x0 is the left crop offset in the scaled domain.
+    Runs on one sequential low-res decode of [start,end] (worker/frames.py)."""
     import cv2
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
+    from worker.frames import FrameSource
+    try:
+        src = FrameSource(input_path, start, end, fps=sample_fps, pix_fmt="bgr24")
+    except Exception:
         return None, []
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    ow = cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 1920
-    oh = cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 1080
-    scale = target_h / float(oh)
-    scaled_w = int(round(ow * scale))
+    scaled_w = int(round(src.orig_w * target_h / float(src.orig_h)))
+    scale = target_h / float(src.height)  # analysis px -> scaled px
 
-    cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-    face_cascade = cv2.CascadeClassifier(cascade_path)
+    face_cascade = _face_cascade()
 
     tracker = None
     def create_tracker():
@@ -206,30 +578,21 @@ def compute_face_track(input_path: str, start: float, end: float, target_h: int
         return False
 
     def detect_face(frame_gray):
-        faces = face_cascade.detectMultiScale(frame_gray, scaleFactor=1.1, minNeighbors=5, minSize=(60,60))
+        faces = face_cascade.detectMultiScale(frame_gray, scaleFactor=1.1, minNeighbors=5, minSize=_min_face(src))
         if len(faces) == 0:
             return None
         x,y,w,h = max(faces, key=lambda f: f[2]*f[3])
         return (int(x), int(y), int(w), int(h))
 
-    interval = 1.0 / sample_fps
-    t = start
     track = []
     bbox = None
     reinit_every = 1.0  # seconds
     last_detect_t = -1e9
 
-    while t <= end + 1e-6:
-        cap.set(cv2.CAP_PROP_POS_MSEC, t * 1000.0)
-        ok, frame = cap.read()
-        if not ok or frame is None:
-            t += interval
-            continue
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
+    for t, frame in src:
         need_redetect = (t - last_detect_t) > reinit_every or tracker is None
         if need_redetect:
-            b = detect_face(gray)
+            b = detect_face(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
             if b is not None:
                 bbox = b
                 create_tracker()
@@ -248,12 +611,7 @@ def compute_face_track(input_path: str, start: float, end: float, target_h: int
             x,y,w,h = bbox
             cx_scaled = (x + w/2.0) * scale
             x0 = int(round(max(0, min(scaled_w - crop_w, cx_scaled - crop_w/2.0))))
-            trel = t - start
-            track.append((trel, x0))
-
-        t += interval
-
-    cap.release()
+            track.append((t - start, x0))
 
     if track:
         import numpy as np
@@ -271,15 +629,15 @@ def compute_face_track(input_path: str, start: float, end: float, target_h: int
 def find_pauses(words, start, end, thr=0.8, max_items=3):
     # Return up to max_items (t_start, t_end) within [start,end] where no words occur for >= thr seconds
     spans = []
-    ws = [w for w in words if w["start"]>=start and w["end"]<=end]
-    if not ws:
+    ws = WordStore.coerce(words).range(start, end)
+    if not len(ws):
         return spans
     last = start
-    for w in ws:
-        gap = w["start"] - last
+    for k in range(len(ws)):
+        gap = ws.start(k) - last
         if gap >= thr:
-            spans.append((last, min(w["start"], end)))
-        last = w["end"]
+            spans.append((last, min(ws.start(k), end)))
+        last = ws.end(k)
     if end - last >= thr:
         spans.append((last, end))
     # clip to max_items and minimal 1.2s duration each
@@ -292,70 +650,9 @@ def find_pauses(words, start, end, thr=0.8, max_items=3):
             break
     return out
 
-def choose_broll(broll_dir, n=2):
-    try:
-        files = [os.path.join(broll_dir, f) for f in os.listdir(broll_dir) if f.lower().endswith(('.mp4','.mov','.mkv','.webm'))]
-    except Exception:
-        files = []
-    random.shuffle(files)
-    return files[:n]
-
-def generate_thumbnail(input_path, start, end, out_path, aspect="9:16", crop_hint=None, title=None):
-    """Extract a mid-frame, apply same crop, and optionally overlay a title with PIL; saves JPEG."""
-    import subprocess, tempfile, os
-    from PIL import Image, ImageDraw, ImageFont
-
-    tmid = (start + end) / 2.0
-    # Build scale/crop filter similar to render_clip
-    vf = 'scale=-2:1920,crop=1080:1920'
-    if aspect == "1:1":
-        vf = 'scale=1080:-2,crop=1080:1080'
-    if aspect == "16:9":
-        vf = 'scale=1920:-2'
-    if crop_hint and aspect == "9:16":
-        scaled_w, x0 = crop_hint
-        vf = f'scale={int(round(scaled_w))}:1920,crop=1080:1920:{x0}:0'
-
-    tmp_png = out_path + ".png"
-    cmd = ["ffmpeg","-y","-ss", f"{tmid}","-i", input_path,"-vframes","1","-vf", vf, tmp_png]
-    subprocess.check_call(cmd)
-
-    # Open and draw overlay
-    im = Image.open(tmp_png).convert("RGB")
-    W,H = im.size
-    draw = ImageDraw.Draw(im)
-    # gradient bar at top
-    bar_h = int(H*0.22)
-    for i in range(bar_h):
-        a = int(200 * (1.0 - i/bar_h))  # fade out
-        draw.rectangle([0, i, W, i], fill=(0,0,0,a))
-    txt = title or "Clip"
-    try:
-        # Try a common font path; fallback to default
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", size=int(H*0.06))
-    except Exception:
-        font = ImageFont.load_default()
-    # Wrap text
-    max_w = int(W*0.92)
-    words = txt.split()
-    lines=[]; cur=""
-    for w in words:
-        test = (cur+" "+w).strip()
-        bw, bh = draw.textbbox((0,0), test, font=font)[2:]
-        if bw <= max_w:
-            cur = test
-        else:
-            if cur: lines.append(cur)
-            cur = w
-    if cur: lines.append(cur)
-    y = int(H*0.04)
-    for line in lines[:3]:
-        # stroke
-        draw.text((int(W*0.04)+1, y+1), line, font=font, fill=(0,0,0))
-        draw.text((int(W*0.04)-1, y-1), line, font=font, fill=(0,0,0))
-        draw.text((int(W*0.04), y), line, font=font, fill=(255,255,255))
-        y += int(bh*1.1 if 'bh' in locals() else H*0.07)
-    im.save(out_path, quality=92)
-    try: os.remove(tmp_png)
-    except Exception: pass
-    return out_path
+def generate_thumbnail(input_path, start, end, out_path, aspect="9:16", crop_hint=None, title=None, at=None):
+    """Extract a mid-frame (or the frame at `at`), apply same crop, and overlay a title; saves JPEG.
+    Single-variant shortcut for worker/thumbnails.py."""
+    from worker.thumbnails import render_variants
+    t = (start + end) / 2.0 if at is None else at
+    return render_variants(input_path, t, [{"title": title, "path": out_path}], aspect, crop_hint)[0]
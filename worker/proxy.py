@@ -0,0 +1,36 @@
+"""Low-resolution analysis proxy and 16 kHz mono WAV, made once per source.
+
+One ffmpeg pass over the downloaded mp4 writes both into the source's media-cache entry:
+proxy.mp4 (PROXY_HEIGHT px, PROXY_FPS, a keyframe every PROXY_GOP frames, tuned for fast decode
+and cheap seeks) and audio16k.wav (the format Whisper and the audio features decode to anyway).
+Face analysis, visual analysis, preview renders and audio features read these instead of the
+full-resolution source; analysis_path() falls back to the source if the proxy is gone.
+"""
+import os
+import subprocess
+
+PROXY_HEIGHT = int(os.getenv("PROXY_HEIGHT", "360"))
+PROXY_FPS = float(os.getenv("PROXY_FPS", "15"))
+PROXY_GOP = int(os.getenv("PROXY_GOP", "15"))
+
+def build(source_path: str):
+    """Write proxy.mp4 and audio16k.wav next to source_path -> (proxy_path, wav_path or None)."""
+    from worker.pipeline import _has_audio
+    d = os.path.dirname(source_path)
+    proxy, wav = os.path.join(d, "proxy.mp4"), os.path.join(d, "audio16k.wav")
+    tmp_proxy, tmp_wav = proxy + ".tmp.mp4", wav + ".tmp.wav"
+    audio = _has_audio(source_path)
+    cmd = ["ffmpeg","-y","-v","error","-i", source_path,
+           "-map","0:v:0","-vf",f"scale=-2:{PROXY_HEIGHT},fps={PROXY_FPS}","-an",
+           "-c:v","libx264","-preset","ultrafast","-tune","fastdecode","-g",str(PROXY_GOP),"-crf","26", tmp_proxy]
+    if audio:
+        cmd += ["-map","0:a:0","-vn","-ac","1","-ar","16000","-c:a","pcm_s16le", tmp_wav]
+    subprocess.check_call(cmd)
+    os.replace(tmp_proxy, proxy)
+    if audio:
+        os.replace(tmp_wav, wav)
+    return proxy, (wav if audio else None)
+
+def analysis_path(proxy_path: str | None, source_path: str | None) -> str | None:
+    """The proxy when it is still on disk (the media cache may have evicted it), else the source."""
+    return proxy_path if proxy_path and os.path.exists(proxy_path) else source_path
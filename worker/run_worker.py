@@ -1,12 +1,15 @@
 import os
 import json
 import time
+import logging
 from typing import Iterator, Dict, Any
 
 from redis import Redis
 from shared.db import SessionLocal
 from api.models import JobLog
 
+log = logging.getLogger(__name__)
+
 # Redis connection
 r = Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
 
@@ -28,36 +31,61 @@ def update_log(log_id: str, **updates):
                 setattr(jl, k, v)
             db.commit()
 
-def handle(job: Dict[str, Any]) -> None:
-    """Minimal handler. Marks logs as success so the pipeline won't crash during bring-up.
-    Extend this with real steps (download/transcribe/render) once the system is healthy.
-    """
-    log_id = job.get("log_id")
-    update_log(log_id, status="started")
-    # TODO: integrate real pipeline here
-    # For now, just acknowledge the job without heavy processing.
-    update_log(log_id, status="success")
+def ensure_log(job: Dict[str, Any]) -> str:
+    """Attach a JobLog row to the job so failures show up in /admin/jobs and can be retried."""
+    if job.get("log_id"):
+        return job["log_id"]
+    for db in with_db():
+        jl = JobLog(type=str(job.get("type") or "UNKNOWN"), payload=job, status="queued")
+        db.add(jl)
+        db.flush()
+        job["log_id"] = jl.id
+        jl.payload = dict(job)  # retry re-enqueues the payload, which then carries its own log_id
+        db.commit()
+    return job["log_id"]
+
+def on_done(job: Dict[str, Any], err: Exception | None, result: Any = None) -> None:
+    if err is None:
+        # parked jobs (e.g. a publish waiting on its full render) finish later under the same log row
+        update_log(job.get("log_id"), status="deferred" if result == "deferred" else "success", error=None)
+    else:
+        update_log(job.get("log_id"), status="error", error=f"{type(err).__name__}: {err}")
 
 def main() -> None:
+    from worker.executor import StageExecutor, setup_logging
+    setup_logging()
     queue = os.getenv("JOBS_QUEUE", "jobs")
-    while True:
-        try:
-            item = r.blpop(queue, timeout=5)
-            if not item:
-                continue
-            _, raw = item
-            try:
-                job = json.loads(raw)
-            except Exception:
-                job = {"raw": raw.decode("utf-8", errors="ignore")}
+    priority = os.getenv("JOBS_PRIORITY_QUEUE", "jobs:priority")  # interactive jobs (THUMBNAILS) go first
+    ex = StageExecutor(on_done)
+    log.info("worker pools: %s", ex.sizes)
+    try:
+        while True:
             try:
-                handle(job)
-            except Exception as e:
-                log_id = job.get("log_id") if isinstance(job, dict) else None
-                update_log(log_id, status="error", error=str(e))
-        except Exception as outer:
-            # Last resort: don't crash the worker loop
-            time.sleep(1)
+                if ex.busy():
+                    time.sleep(0.5)
+                    continue
+                item = r.blpop([priority, queue], timeout=5)
+                if not item:
+                    continue
+                key, raw = item
+                try:
+                    job = json.loads(raw)
+                except Exception:
+                    job = {"type": "UNKNOWN", "raw": raw.decode("utf-8", errors="ignore")}
+                if not ex.has_capacity(ex.stage_for(job)):
+                    # stage saturated: hand the job back (to the far end) for this or another node
+                    r.rpush(key, raw)
+                    time.sleep(0.5)
+                    continue
+                ensure_log(job)
+                update_log(job.get("log_id"), status="started")
+                ex.submit(job)
+            except Exception as outer:
+                # Last resort: don't crash the worker loop
+                log.exception("worker loop error: %s", outer)
+                time.sleep(1)
+    finally:
+        ex.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,53 @@
+"""Full-text index of transcripts.
+
+Each video's latest transcript is cut into TranscriptChunk rows of about TEXT_CHUNK_SEC, closed
+on a pause where one is near. A row keeps its text, bounds and its own words with timestamps;
+Postgres derives a tsvector from the text (generated column, GIN index), so a search is an index
+scan over chunks and matched words map back to times without loading any Transcript row.
+"""
+import os
+import re
+
+TEXT_CHUNK_SEC = float(os.getenv("TEXT_CHUNK_SEC", "20"))
+TEXT_CHUNK_GAP = float(os.getenv("TEXT_CHUNK_GAP", "0.5"))  # pause (s) that may close a chunk
+_WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+def chunk_rows(video_id, transcript_id, words):
+    """TranscriptChunk rows for a bulk insert, one linear pass over the words."""
+    from worker.wordstore import WordStore
+    ws = WordStore.coerce(words)
+    rows, a, n = [], 0, len(ws)
+    for i in range(n):
+        span = ws.end(i) - ws.start(a)
+        last = i + 1 == n
+        if last or span >= 1.5 * TEXT_CHUNK_SEC or (span >= TEXT_CHUNK_SEC and ws.start(i + 1) - ws.end(i) > TEXT_CHUNK_GAP):
+            part = ws[a:i + 1]
+            rows.append({"video_id": video_id, "transcript_id": transcript_id, "t_start": float(ws.start(a)),
+                         "t_end": float(ws.end(i)), "text": part.text(),
+                         "words": [[w["w"].strip(), round(w["start"], 2), round(w["end"], 2)] for w in part]})
+            a = i + 1
+    return rows
+
+def index_transcript(db, t):
+    """Replace the video's chunks with those of transcript t (caller commits)."""
+    from sqlalchemy import insert
+    from api.models import TranscriptChunk
+    db.query(TranscriptChunk).filter_by(video_id=t.video_id).delete(synchronize_session=False)
+    rows = chunk_rows(t.video_id, t.id, t.words or [])
+    if rows:
+        db.execute(insert(TranscriptChunk), rows)
+    return len(rows)
+
+def query_terms(q: str):
+    """Lower-cased words a websearch-style query asks for (drops OR and -excluded words)."""
+    terms = set()
+    for tok in q.replace('"', " ").split():
+        if tok.lower() == "or" or tok.startswith("-"):
+            continue
+        terms.update(m.lower() for m in _WORD.findall(tok))
+    return terms
+
+def match_words(words, terms):
+    """[{"w", "start", "end"}] of a chunk's words that match a query term, as the 'simple' parser splits them."""
+    return [{"w": w, "start": s, "end": e} for w, s, e in words or []
+            if any(p.lower() in terms for p in _WORD.findall(w))]
@@ -0,0 +1,80 @@
+"""Thumbnail engine: one frame extraction, every variant composed in memory.
+
+The frame is piped out of ffmpeg as a single BMP (no temp file), the top gradient is applied once
+as a vectorized NumPy alpha blend, and each title variant is drawn on a copy of that base before
+being written as JPEG. The API's thumbnail endpoints enqueue a THUMBNAILS job and wait for the
+worker's reply on a per-request Redis key (see worker.jobs.thumbnails).
+"""
+import io
+import os
+import subprocess
+
+FONT_PATH = os.getenv("THUMB_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+
+def frame_filter(aspect="9:16", crop_hint=None) -> str:
+    vf = 'scale=-2:1920,crop=1080:1920'
+    if aspect == "1:1":
+        vf = 'scale=1080:-2,crop=1080:1080'
+    if aspect == "16:9":
+        vf = 'scale=1920:-2'
+    if crop_hint and aspect == "9:16":
+        scaled_w, x0 = crop_hint
+        vf = f'scale={int(round(scaled_w))}:1920,crop=1080:1920:{x0}:0'
+    return vf
+
+def extract_frame(input_path, t, aspect="9:16", crop_hint=None):
+    """The scaled/cropped frame at t as an RGB PIL image, read from an ffmpeg pipe."""
+    from PIL import Image
+    out = subprocess.check_output(["ffmpeg","-v","error","-ss",f"{t}","-i", input_path,"-frames:v","1",
+                                   "-vf", frame_filter(aspect, crop_hint),"-c:v","bmp","-f","image2pipe","-"])
+    return Image.open(io.BytesIO(out)).convert("RGB")
+
+def with_gradient(im, frac=0.22, max_alpha=200):
+    """Darken the top `frac` of the image with a black fade (alpha max_alpha -> 0), in one array op."""
+    import numpy as np
+    from PIL import Image
+    arr = np.asarray(im, dtype=np.float32).copy()
+    bar_h = int(arr.shape[0] * frac)
+    keep = 1.0 - (max_alpha / 255.0) * (1.0 - np.arange(bar_h, dtype=np.float32) / max(bar_h, 1))
+    arr[:bar_h] *= keep[:, None, None]
+    return Image.fromarray(arr.astype(np.uint8))
+
+def _font(size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype(FONT_PATH, size=size)
+    except Exception:
+        return ImageFont.load_default()
+
+def draw_title(im, title):
+    """Draw up to three wrapped lines of title (white, black outline) at the top of im, in place."""
+    from PIL import ImageDraw
+    W, H = im.size
+    draw = ImageDraw.Draw(im)
+    font = _font(int(H * 0.06))
+    max_w = int(W * 0.92)
+    lines, cur = [], ""
+    for w in (title or "Clip").split():
+        test = (cur + " " + w).strip()
+        if draw.textlength(test, font=font) <= max_w:
+            cur = test
+        else:
+            if cur:
+                lines.append(cur)
+            cur = w
+    if cur:
+        lines.append(cur)
+    line_h = int((font.getbbox("Ag")[3] if hasattr(font, "getbbox") else H * 0.06) * 1.1)
+    y = int(H * 0.04)
+    for line in lines[:3]:
+        draw.text((int(W * 0.04), y), line, font=font, fill=(255, 255, 255), stroke_width=2, stroke_fill=(0, 0, 0))
+        y += line_h
+    return im
+
+def render_variants(input_path, t, variants, aspect="9:16", crop_hint=None):
+    """variants: [{"title", "path"}]. One frame decode, one gradient, one JPEG per variant."""
+    base = with_gradient(extract_frame(input_path, t, aspect, crop_hint))
+    for var in variants:
+        os.makedirs(os.path.dirname(var["path"]), exist_ok=True)
+        draw_title(base.copy(), var.get("title")).save(var["path"], quality=92)
+    return [var["path"] for var in variants]
@@ -0,0 +1,60 @@
+"""Content-addressed transcript cache on the media volume.
+
+Key = sha256(source file bytes) + Whisper settings (model, device, compute type, language), so
+duplicate ingests of the same upload and job retries reuse the transcript instead of re-running
+ASR, while changing any model setting misses cleanly. Entries are gzipped JSON under
+MEDIA_ROOT/cache/transcripts; hits and misses are counted in Redis for /health/metrics.
+"""
+import os
+import json
+import gzip
+import hashlib
+
+from redis import Redis
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/data")
+CACHE_DIR = os.path.join(MEDIA_ROOT, "cache", "transcripts")
+METRIC_KEY = "metrics:transcript_cache:{}"
+
+def fingerprint(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_key(path: str) -> str:
+    from worker.model_registry import WHISPER_MODEL_NAME, WHISPER_COMPUTE_TYPE, DEVICE, WHISPER_LANGUAGE
+    lang = WHISPER_LANGUAGE or "auto"  # the language both transcribe paths actually pass to Whisper
+    return hashlib.sha256(f"{fingerprint(path)}|{WHISPER_MODEL_NAME}|{DEVICE}|{WHISPER_COMPUTE_TYPE}|{lang}".encode()).hexdigest()
+
+def _path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], key + ".json.gz")
+
+def _count(kind: str) -> None:
+    try:
+        Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0")).incr(METRIC_KEY.format(kind))
+    except Exception:
+        pass  # metrics must never fail a transcription
+
+def get(key: str):
+    try:
+        with gzip.open(_path(key), "rt", encoding="utf-8") as f:
+            res = json.load(f)
+    except (FileNotFoundError, OSError, ValueError):
+        _count("miss")
+        return None
+    _count("hit")
+    return res
+
+def put(key: str, res: dict) -> None:
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(res, f, separators=(',',':'))
+    os.replace(tmp, path)  # atomic: concurrent workers never see a partial entry
+
+def stats() -> dict:
+    r = Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    return {k: int(r.get(METRIC_KEY.format(k)) or 0) for k in ("hit", "miss")}
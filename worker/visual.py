@@ -0,0 +1,125 @@
+"""Single-pass visual analysis: scene cuts, motion energy and face boxes.
+
+One low-resolution sequential decode of the whole source (worker/frames.py) feeds three cheap
+per-frame measurements, stored as compact arrays in MEDIA_ROOT/analysis/<video id>/visual.npz:
+
+- cuts:   scene-cut timestamps, where the 16-bin luma histogram jumps by more than VISUAL_CUT_THRESHOLD
+- motion: per-second mean absolute luma difference between consecutive sampled frames
+- faces:  (t, x, y, w, h) of the largest face, in source pixels, sampled at VISUAL_FACE_FPS
+
+Ranking, render and thumbnails read these instead of decoding the video again.
+"""
+import os
+from functools import lru_cache
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/data")
+VISUAL_FPS = float(os.getenv("VISUAL_FPS", "4"))
+VISUAL_FACE_FPS = float(os.getenv("VISUAL_FACE_FPS", "2"))
+VISUAL_CUT_THRESHOLD = float(os.getenv("VISUAL_CUT_THRESHOLD", "0.5"))  # L1 distance of normalized histograms
+VISUAL_SNAP_SEC = float(os.getenv("VISUAL_SNAP_SEC", "1.5"))  # max boundary shift when snapping to a cut
+VISUAL_WEIGHT = float(os.getenv("VISUAL_WEIGHT", "0.2"))
+
+def visual_path(video_id: str) -> str:
+    return os.path.join(MEDIA_ROOT, "analysis", str(video_id), "visual.npz")
+
+def analyze_source(path: str, out_path: str) -> str:
+    import numpy as np
+    from worker.frames import FrameSource, probe
+    from worker.pipeline import _face_cascade, _min_face
+    info = probe(path)
+    src = FrameSource(path, 0.0, info["duration"], fps=VISUAL_FPS, pix_fmt="gray", info=info)
+    cascade = _face_cascade()
+    face_every = max(1, int(round(VISUAL_FPS / VISUAL_FACE_FPS)))
+    n_sec = int(np.ceil(info["duration"])) + 1
+    motion_sum, motion_n = np.zeros(n_sec), np.zeros(n_sec)
+    cuts, faces = [], []
+    prev, prev_hist = None, None
+    for k, (t, gray) in enumerate(src):
+        small = gray[::4, ::4].astype(np.int16)
+        hist = np.bincount((gray >> 4).ravel(), minlength=16) / float(gray.size)
+        if prev is not None:
+            sec = min(int(t), n_sec - 1)
+            motion_sum[sec] += np.abs(small - prev).mean() / 255.0
+            motion_n[sec] += 1
+            if np.abs(hist - prev_hist).sum() > VISUAL_CUT_THRESHOLD and (not cuts or t - cuts[-1] > 0.5):
+                cuts.append(t)
+        prev, prev_hist = small, hist
+        if k % face_every == 0:
+            found = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=_min_face(src))
+            if len(found):
+                x, y, w, h = max(found, key=lambda f: f[2]*f[3])
+                faces.append((t, x * src.scale, y * src.scale, w * src.scale, h * src.scale))
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp = out_path + ".tmp.npz"
+    np.savez_compressed(tmp, cuts=np.asarray(cuts, dtype=np.float32),
+                        motion=(motion_sum / np.maximum(motion_n, 1)).astype(np.float32),
+                        faces=np.asarray(faces, dtype=np.float32).reshape(-1, 5),
+                        meta=np.asarray([info["width"], info["height"], info["duration"], VISUAL_FACE_FPS], dtype=np.float64))
+    os.replace(tmp, out_path)
+    return out_path
+
+@lru_cache(maxsize=16)
+def _load(path: str, mtime: float):
+    import numpy as np
+    with np.load(path) as z:
+        return {k: z[k] for k in z.files}
+
+def load(path: str | None):
+    """Arrays for a visual.npz, or None if the video has not been analyzed."""
+    if not path or not os.path.exists(path):
+        return None
+    return _load(path, os.path.getmtime(path))
+
+def snap(vis, t: float, max_shift: float | None = None) -> float:
+    """Move t to the nearest scene cut within max_shift seconds, else leave it."""
+    import numpy as np
+    cuts = vis["cuts"] if vis else ()
+    if not len(cuts):
+        return t
+    k = int(np.searchsorted(cuts, t))
+    near = min((float(cuts[p]) for p in (k - 1, k) if 0 <= p < len(cuts)), key=lambda c: abs(c - t))
+    return near if abs(near - t) <= (VISUAL_SNAP_SEC if max_shift is None else max_shift) else t
+
+def snap_range(vis, start: float, end: float):
+    s, e = snap(vis, start), snap(vis, end)
+    return (s, e) if e - s >= 0.5 * (end - start) else (start, end)
+
+def thumb_time(vis, start: float, end: float) -> float:
+    """Middle of the longest shot inside [start, end], so the thumbnail never lands on a transition."""
+    import numpy as np
+    if not vis or not len(vis["cuts"]):
+        return (start + end) / 2.0
+    cuts = vis["cuts"]
+    edges = [start] + [float(c) for c in cuts[(cuts > start) & (cuts < end)]] + [end]
+    k = int(np.argmax(np.diff(edges)))
+    return (edges[k] + edges[k+1]) / 2.0
+
+def window_features(vis, starts, ends):
+    """Per-window motion mean, cut count and face ratio via prefix sums / bisection (O(1) per window)."""
+    import numpy as np
+    starts, ends = np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64)
+    motion = vis["motion"].astype(np.float64)
+    c_mot = np.concatenate([[0.0], np.cumsum(motion)])
+    a = np.clip(starts.astype(np.int64), 0, len(motion))
+    b = np.clip(np.ceil(ends).astype(np.int64), 0, len(motion))
+    mot = (c_mot[b] - c_mot[a]) / np.maximum(b - a, 1)
+    cuts = vis["cuts"]
+    n_cuts = np.searchsorted(cuts, ends) - np.searchsorted(cuts, starts)
+    ft = vis["faces"][:, 0]
+    face_fps = float(vis["meta"][3])
+    n_faces = np.searchsorted(ft, ends) - np.searchsorted(ft, starts)
+    ratio = np.minimum(1.0, n_faces / np.maximum((ends - starts) * face_fps, 1.0))
+    return {"motion": mot, "cuts": n_cuts.astype(np.float64), "face_ratio": ratio}
+
+def crop_hint(vis, start: float, end: float, target_h: int = 1920, crop_w: int = 1080):
+    """(scaled_w, x0) for a 9:16 crop from the stored face boxes; same result shape as compute_face_crop."""
+    import numpy as np
+    w, h = float(vis["meta"][0]), float(vis["meta"][1])
+    scaled_w = w * target_h / h
+    f = vis["faces"]
+    sel = f[(f[:, 0] >= start) & (f[:, 0] <= end)]
+    if not len(sel):
+        return int(scaled_w), int(max(0, (scaled_w - crop_w) / 2))
+    med = float(np.median((sel[:, 1] + sel[:, 3] / 2.0) * target_h / h))
+    x0 = max(0, min(int(scaled_w - crop_w), int(round(med - crop_w / 2))))
+    return int(round(scaled_w)), x0
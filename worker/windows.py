@@ -0,0 +1,40 @@
+"""Stored candidate windows, for re-ranking without re-transcribing or re-embedding.
+
+ANALYZE saves every window it scored (bounds, word-derived features and embedding, tagged with the
+transcript it came from) to MEDIA_ROOT/analysis/<video id>/windows.npz. RERANK loads that table,
+re-attaches visual/audio features from their own npz files (prefix sums, no decoding), rescores
+with the given weights and reruns NMS, so the model is never touched.
+"""
+import os
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/data")
+COLUMNS = ("i", "j", "start", "end", "window", "n_words", "exclam", "avg_word", "word_std", "quoteability")
+
+def windows_path(video_id: str) -> str:
+    return os.path.join(MEDIA_ROOT, "analysis", str(video_id), "windows.npz")
+
+def save(tab, embs, transcript_id, out_path: str) -> str:
+    import numpy as np
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp = out_path + ".tmp.npz"
+    np.savez_compressed(tmp, emb=np.asarray(embs, dtype=np.float32), transcript=np.asarray(str(transcript_id)),
+                        **{k: tab[k] for k in COLUMNS})
+    os.replace(tmp, out_path)
+    return out_path
+
+def load(path: str | None, transcript_id=None):
+    """(tab, embs) as saved, or None if missing or built from a different transcript."""
+    import numpy as np
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path) as z:
+        if transcript_id is not None and str(z["transcript"]) != str(transcript_id):
+            return None
+        return {k: z[k] for k in COLUMNS}, z["emb"]
+
+def rerank(stored, visual=None, audio=None, weights=None, top_k=12, iou_thr=0.3):
+    """Segment rows from a loaded (tab, embs), as rank_segments would return them."""
+    from worker.pipeline import attach_signals, score_windows, pick_windows
+    tab, embs = stored
+    tab = attach_signals(dict(tab), visual, audio)
+    return pick_windows(tab, embs, score_windows(tab, weights), top_k, iou_thr)
@@ -0,0 +1,94 @@
+"""Columnar word store for transcripts.
+
+Transcripts are persisted as lists of {"w","start","end"} dicts. WordStore keeps the same data as
+parallel float arrays (start/end) plus token ids into an interned token table, so a time-range
+lookup is two bisects and slicing returns a view over the shared arrays instead of a filtered copy.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+class WordStore:
+    __slots__ = ("starts", "ends", "ids", "vocab", "lo", "hi")
+
+    def __init__(self, starts, ends, ids, vocab, lo=0, hi=None):
+        self.starts, self.ends, self.ids, self.vocab = starts, ends, ids, vocab
+        self.lo = lo
+        self.hi = len(starts) if hi is None else hi
+
+    @classmethod
+    def from_words(cls, words):
+        """Build from transcript dicts (sorted by start, as faster-whisper emits them)."""
+        starts, ends, ids = array("d"), array("d"), array("I")
+        vocab, index = [], {}
+        for w in words:
+            tok = w["w"]
+            tid = index.get(tok)
+            if tid is None:
+                tid = index[tok] = len(vocab)
+                vocab.append(tok)
+            starts.append(float(w["start"]))
+            ends.append(float(w["end"]))
+            ids.append(tid)
+        return cls(starts, ends, ids, vocab)
+
+    @classmethod
+    def coerce(cls, words):
+        return words if isinstance(words, cls) else cls.from_words(words or [])
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            a, b, step = k.indices(len(self))
+            if step != 1:
+                raise ValueError("WordStore slices must be contiguous")
+            return WordStore(self.starts, self.ends, self.ids, self.vocab, self.lo + a, self.lo + max(a, b))
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        i = self.lo + k
+        return {"w": self.vocab[self.ids[i]], "start": self.starts[i], "end": self.ends[i]}
+
+    def __iter__(self):
+        for i in range(self.lo, self.hi):
+            yield {"w": self.vocab[self.ids[i]], "start": self.starts[i], "end": self.ends[i]}
+
+    def token(self, k):
+        return self.vocab[self.ids[self.lo + k]]
+
+    def start(self, k):
+        return self.starts[self.lo + k]
+
+    def end(self, k):
+        return self.ends[self.lo + k]
+
+    def tokens(self):
+        v, ids = self.vocab, self.ids
+        return [v[ids[i]] for i in range(self.lo, self.hi)]
+
+    def text(self):
+        return "".join(self.tokens()).strip()
+
+    def range(self, t0, t1):
+        """View of the words fully inside [t0, t1] in O(log n)."""
+        lo = bisect_left(self.starts, t0, self.lo, self.hi)
+        hi = bisect_right(self.starts, t1, lo, self.hi)
+        while hi > lo and self.ends[hi-1] > t1:  # trailing words that start inside but run past t1
+            hi -= 1
+        return WordStore(self.starts, self.ends, self.ids, self.vocab, lo, hi)
+
+    def columns(self):
+        """Zero-copy NumPy views (starts, ends, token_ids) of this slice."""
+        import numpy as np
+        if not len(self.starts):
+            return np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.uint32)
+        return (np.frombuffer(self.starts, dtype=np.float64)[self.lo:self.hi],
+                np.frombuffer(self.ends, dtype=np.float64)[self.lo:self.hi],
+                np.frombuffer(self.ids, dtype=np.uint32)[self.lo:self.hi])
+
+    def to_words(self, offset=0.0):
+        """Materialize as transcript dicts, shifting times by -offset."""
+        v, ids, s, e = self.vocab, self.ids, self.starts, self.ends
+        return [{"w": v[ids[i]], "start": s[i] - offset, "end": e[i] - offset} for i in range(self.lo, self.hi)]